@@ -13,7 +13,7 @@ package.domain = org.test
 source.dir = .
 
 # (list) Source files to include (let empty to include all the files)
-source.include_exts = py,png,jpg,kv,atlas
+source.include_exts = py,png,jpg,kv,atlas,json
 
 # (list) List of inclusions using pattern matching
 #source.include_patterns = assets/*,images/*.png
@@ -452,3 +452,13 @@ warn_on_root = 1
 #    Then, invoke the command line with the "demo" profile:
 #
 #buildozer --profile demo android debug
+
+#    Debug logging: the "debug" profile also packages logging.ini, which turns on
+#    the trajectory_chess debug channels. It is not committed; copy it from the
+#    example first. Release builds leave it out and only log warnings.
+#
+#cp logging.ini.example logging.ini
+#buildozer --profile debug android debug
+
+[app@debug]
+source.include_exts = py,png,jpg,kv,atlas,ini,json
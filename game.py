@@ -1,7 +1,16 @@
 import pygame
-import random
+import argparse
+import atexit
 import os
 import sys
+import time
+
+from trajectory_chess import profiling, render
+from trajectory_chess.log import add_log_level_argument, configure_logging, move_logger
+from trajectory_chess.puzzles import load_daily_puzzle, load_puzzle
+from trajectory_chess.records import GameRecorder
+from trajectory_chess.rules import Game
+from trajectory_chess.stats import StatsRecorder
 
 def resource_path(relative_path):
     """ Get the absolute path to a resource, works for dev and PyInstaller """
@@ -12,291 +21,145 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-# Initialize Pygame
-pygame.init()
-
 # Window size and settings
 WIDTH, HEIGHT = 800, 900  # Height accommodates the buttons
-SQUARE_SIZE = WIDTH // 8
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Chess Puzzle Game")
+BOARD_AREA = WIDTH  # The board is fitted into a WIDTH x WIDTH square
+SQUARE_SIZE = BOARD_AREA // 8
 
-# Colors
-LIGHT_WOOD = (220, 190, 140)  # Light wood color
-DARK_WOOD = (115, 74, 18)     # Dark wood color
+# Colors (board, piece and trajectory colors live in trajectory_chess.render)
 RED_BACKGROUND = (128, 0, 0)  # Board background
 BLUE = (0, 0, 255)
 GREY = (128, 128, 128)
-SELECTED_COLOR = (255, 255, 0)       # Yellow for selected figure
-TRAJECTORY_COLOR = (255, 255, 255)   # White color for trajectory
 BUTTON_COLOR = (200, 200, 200)       # Light grey for buttons
 BUTTON_HOVER_COLOR = (160, 160, 160) # Darker grey when hovered
-POSSIBLE_MOVE_COLOR = (152, 251, 152)  # Pale Green for possible moves
-
-# Figures
-standard_figures = ["king", "queen", "rook", "rook", "bishop", "bishop", "knight", "knight"]
-all_figures = ["king", "queen", "rook", "bishop", "knight"]  # Used for unlimited configuration
-
-# Load images for the pieces
-piece_images = {}
-for piece_name in ["king", "queen", "rook", "bishop", "knight", "pawn"]:
-    image_path = resource_path(f"{piece_name}.png")
-    image = pygame.image.load(image_path)
-    image = pygame.transform.scale(image, (SQUARE_SIZE, SQUARE_SIZE))
-    piece_images[piece_name] = image
-
-# Font for displaying messages and buttons
-font = pygame.font.Font(None, 36)
-button_font = pygame.font.Font(None, 30)
-large_font = pygame.font.Font(None, 60)  # Reduced font size for large messages
-
-# Class for the figures
-class Figure:
-    def __init__(self, type, initial_x, initial_y):
-        self.type = type
-        self.active = True
-        self.trajectory = []
-        self.initial_x = initial_x
-        self.initial_y = initial_y
-
-# Class for chessboard cells
-class Cell:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.figure = None
-        self.pawn = False
-
-    def draw(self, selected=False):
-        # Draw the cell
-        rect = pygame.Rect(self.x * SQUARE_SIZE, self.y * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
-        color = LIGHT_WOOD if (self.x + self.y) % 2 == 0 else DARK_WOOD
-        if selected:
-            pygame.draw.rect(screen, SELECTED_COLOR, rect)
-        else:
-            pygame.draw.rect(screen, color, rect)
-        # Draw a pawn
-        if self.pawn:
-            pawn_image = piece_images["pawn"]
-            screen.blit(pawn_image, rect.topleft)
-        # Draw a figure
-        if self.figure:
-            image = piece_images[self.figure.type]
-            if not self.figure.active:
-                # Dim the image if the figure is inactive
-                image = image.copy()
-                image.fill((100, 100, 100, 100), special_flags=pygame.BLEND_RGBA_MULT)
-            screen.blit(image, rect.topleft)
+
+# The window and fonts are created by init_display(), so importing this
+# module does not initialize pygame or open a window
+screen = None
+font = None
+button_font = None
+large_font = None
+hud_font = None
+
+# Performance HUD, toggled with F3 (which also turns profiling on)
+hud_visible = False
+hud_panel = None  # Surface drawn from hud_source
+hud_source = None  # The Profiler.hud() summary hud_panel shows
+HUD_BACKGROUND = (0, 0, 0, 190)
+HUD_TEXT_COLOR = (0, 255, 0)
+
+# Images for the pieces, loaded and scaled on first use
+sprites = render.SpriteCache(SQUARE_SIZE, resource_path(""))
+
+# Initialize Pygame, the window and the fonts
+def init_display():
+    global screen, font, button_font, large_font, hud_font
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Chess Puzzle Game")
+    # Font for displaying messages and buttons
+    font = pygame.font.Font(None, 36)
+    button_font = pygame.font.Font(None, 30)
+    large_font = pygame.font.Font(None, 60)  # Reduced font size for large messages
+    hud_font = pygame.font.Font(None, 22)
+
+# Game state: rules live in trajectory_chess, selection is a front-end concern
+game = Game()
+selected_cell = None
+possible_moves = []
+# Appends finished games to a record file when started with --record
+recorder = None
+# Appends each game's outcome, steps and time to a stats file when started with --stats
+stats = None
+
+# Switch to a width x height board with pawn_rows rows of pawns, scaling the squares to fit
+def set_board_size(width, height, pawn_rows):
+    global game, SQUARE_SIZE, sprites
+    game = Game(None, width, height, pawn_rows)
+    SQUARE_SIZE = BOARD_AREA // max(width, height)
+    sprites = render.SpriteCache(SQUARE_SIZE, resource_path(""))
+
+# Draw a chessboard cell with its pawn or figure
+def draw_cell(cell, selected=False):
+    render.draw_cell(screen, cell, SQUARE_SIZE, sprites, selected)
+
+# Cached trajectory polylines in pixel coordinates, keyed by figure.
+# Trajectories only grow, so each move appends its segment here instead of
+# every frame rebuilding all the lines from the figures' cell lists.
+trajectory_points = {}
+trajectory_square_size = SQUARE_SIZE
+
+def cell_center(coord):
+    return render.cell_center(coord, SQUARE_SIZE)
+
+# Append a newly recorded trajectory segment to the figure's cached polyline
+def extend_trajectory_points(figure, segment):
+    points = trajectory_points.setdefault(figure, [])
+    points.extend(cell_center(coord) for coord in segment)
+
+# Recompute all cached polylines, only needed when SQUARE_SIZE changes
+def rescale_trajectory_points():
+    global trajectory_square_size
+    trajectory_square_size = SQUARE_SIZE
+    for figure, points in trajectory_points.items():
+        points[:] = [cell_center(coord) for coord in figure.trajectory]
+
+# Draw trajectories for all figures
+def draw_trajectories():
+    if trajectory_square_size != SQUARE_SIZE:
+        rescale_trajectory_points()
+    render.draw_polylines(screen, trajectory_points.values(), render.line_width(SQUARE_SIZE))
 
 # Function to create a new game with existing configuration
 def restart_game():
-    global board, figures, move_count, selected_cell, possible_moves
-    # Reset move count and selections
-    move_count = 0
+    global selected_cell, possible_moves
+    # Reset selections
     selected_cell = None
     possible_moves = []
-    # Reset figures and pawns on the board
-    for row in board:
-        for cell in row:
-            cell.figure = None
-            cell.pawn = False
-    # Place pawns on the top row
-    for x in range(8):
-        board[x][0].pawn = True
-    # Reset figures to initial positions
-    for figure in figures:
-        figure.active = True
-        figure.trajectory = []
-        board[figure.initial_x][figure.initial_y].figure = figure
+    trajectory_points.clear()
+    game.restart_game()
+    if recorder is not None:
+        recorder.start(game)
+    if stats is not None:
+        stats.start(game)
 
 # Function to create a new game with new standard configuration
 def new_configuration():
-    global board, figures, move_count, selected_cell, possible_moves
-    # Create the chessboard
-    board = [[Cell(x, y) for y in range(8)] for x in range(8)]
-    # List to keep track of all figures
-    figures = []
-    # Reset move count and selections
-    move_count = 0
+    global selected_cell, possible_moves
     selected_cell = None
     possible_moves = []
-    setup_pawns()
-    setup_figures()
+    trajectory_points.clear()
+    game.new_configuration()
+    if recorder is not None:
+        recorder.start(game)
+    if stats is not None:
+        stats.start(game)
 
 # Function to create a new game with unlimited configuration
 def unlimited_configuration():
-    global board, figures, move_count, selected_cell, possible_moves
-    # Create the chessboard
-    board = [[Cell(x, y) for y in range(8)] for x in range(8)]
-    # List to keep track of all figures
-    figures = []
-    # Reset move count and selections
-    move_count = 0
+    global selected_cell, possible_moves
     selected_cell = None
     possible_moves = []
-    setup_pawns()
-    setup_unlimited_figures()
-
-# Set up pawns on the top row (y = 0)
-def setup_pawns():
-    for x in range(8):
-        board[x][0].pawn = True
-
-# Set up figures on the bottom row (y = 7)
-def setup_figures():
-    random.shuffle(standard_figures)  # Shuffle the standard set
-    for x in range(8):
-        figure = Figure(standard_figures[x], x, 7)
-        board[x][7].figure = figure
-        figures.append(figure)
-
-# Set up unlimited figures on the bottom row (y = 7)
-def setup_unlimited_figures():
-    # Randomly choose figures, could be duplicates
-    unlimited_figures = [random.choice(all_figures) for _ in range(8)]
-    for x in range(8):
-        figure = Figure(unlimited_figures[x], x, 7)
-        board[x][7].figure = figure
-        figures.append(figure)
-    # Ensure the game is winnable by having at least as many active figures as pawns
-    active_figures = len(figures)
-    pawns = sum(1 for x in range(8) if board[x][0].pawn)
-    if active_figures < pawns:
-        # Add more figures until the number of active figures is at least the number of pawns
-        needed_figures = pawns - active_figures
-        for i in range(needed_figures):
-            x = random.randint(0, 7)
-            while board[x][7].figure is not None:
-                x = random.randint(0, 7)
-            figure = Figure(random.choice(all_figures), x, 7)
-            board[x][7].figure = figure
-            figures.append(figure)
-
-# Function to get all occupied cells and trajectory cells
-def get_occupied_cells(exclude_cell=None):
-    occupied_cells_figures = set()
-    occupied_cells_pawns = set()
-    trajectory_cells = set()
-    for row in board:
-        for cell in row:
-            if cell.figure and cell != exclude_cell:
-                occupied_cells_figures.add((cell.x, cell.y))
-            if cell.figure and cell.figure.trajectory:
-                trajectory_cells.update(cell.figure.trajectory)
-            if cell.pawn:
-                occupied_cells_pawns.add((cell.x, cell.y))
-    return occupied_cells_figures, occupied_cells_pawns, trajectory_cells
-
-# Function to get the trajectory between two cells
-def get_trajectory(start_cell, end_cell):
-    trajectory = []
-    x0, y0 = start_cell.x, start_cell.y
-    x1, y1 = end_cell.x, end_cell.y
-    figure_type = start_cell.figure.type
-
-    if figure_type == "knight":
-        # For knight, include the L-shape path
-        dx = x1 - x0
-        dy = y1 - y0
-        trajectory.append((x0, y0))
-        if abs(dx) == 2 and abs(dy) == 1:
-            mid_x = x0 + dx // 2
-            trajectory.append((mid_x, y0))
-        elif abs(dx) == 1 and abs(dy) == 2:
-            mid_y = y0 + dy // 2
-            trajectory.append((x0, mid_y))
-        trajectory.append((x1, y1))
-    elif figure_type in ["rook", "bishop", "queen"]:
-        dx = x1 - x0
-        dy = y1 - y0
-        steps = max(abs(dx), abs(dy))
-        dx_step = (dx // steps) if steps != 0 else 0
-        dy_step = (dy // steps) if steps != 0 else 0
-        x, y = x0, y0
-        for _ in range(steps + 1):
-            trajectory.append((x, y))
-            x += dx_step
-            y += dy_step
-    elif figure_type == "king":
-        trajectory.append((x0, y0))
-        trajectory.append((x1, y1))
-    return trajectory
-
-# Get possible moves for a figure
-def get_possible_moves(cell):
-    moves = []
-    occupied_cells_figures, occupied_cells_pawns, trajectory_cells = get_occupied_cells(exclude_cell=cell)
-
-    # Other trajectories (excluding the current figure's own trajectory)
-    other_trajectories = trajectory_cells.copy()
-    if cell.figure.trajectory:
-        other_trajectories.difference_update(cell.figure.trajectory)
-
-    figure_type = cell.figure.type
-
-    # For different figure types
-    if figure_type == "knight":
-        knight_moves = [
-            (-2, -1), (-1, -2), (1, -2), (2, -1),
-            (2, 1), (1, 2), (-1, 2), (-2, 1)
-        ]
-        for dx, dy in knight_moves:
-            x, y = cell.x + dx, cell.y + dy
-            if 0 <= x < 8 and 0 <= y < 8:
-                if ((x, y) not in occupied_cells_figures and
-                    (x, y) not in other_trajectories and
-                    (x, y) not in cell.figure.trajectory):  # Exclude own trajectory
-                    moves.append((x, y))
-    elif figure_type == "king":
-        for dx, dy in [(-1, -1), (1, -1), (-1, 1), (1, 1), (0, 1), (1, 0), (-1, 0), (0, -1)]:
-            x, y = cell.x + dx, cell.y + dy
-            if 0 <= x < 8 and 0 <= y < 8:
-                if ((x, y) not in occupied_cells_figures and
-                    (x, y) not in other_trajectories and
-                    (x, y) not in cell.figure.trajectory):  # Exclude own trajectory
-                    moves.append((x, y))
-    elif figure_type in ["rook", "bishop", "queen"]:
-        directions = []
-        if figure_type == "rook":
-            directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        elif figure_type == "bishop":
-            directions = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
-        elif figure_type == "queen":
-            directions = [(-1, -1), (1, -1), (-1, 1), (1, 1), (0, 1), (1, 0), (-1, 0), (0, -1)]
-        for dx, dy in directions:
-            for step in range(1, 8):
-                x = cell.x + dx * step
-                y = cell.y + dy * step
-                if 0 <= x < 8 and 0 <= y < 8:
-                    if (x, y) in occupied_cells_figures:
-                        break  # Can't move past another figure
-                    if (x, y) in cell.figure.trajectory:
-                        break  # Can't land on or move past own trajectory
-                    # Can fly over other trajectories but cannot land on them
-                    if (x, y) in other_trajectories:
-                        continue
-                    moves.append((x, y))
-                else:
-                    break
-    return moves
-
-# Check if all pawns are destroyed
-def all_pawns_destroyed():
-    for row in board:
-        for cell in row:
-            if cell.pawn:
-                return False
-    return True
-
-# Check if any moves are possible
-def any_possible_moves():
-    for row in board:
-        for cell in row:
-            if cell.figure and cell.figure.active:
-                possible_moves = get_possible_moves(cell)
-                if possible_moves:
-                    return True
-    return False
+    trajectory_points.clear()
+    game.unlimited_configuration()
+    if recorder is not None:
+        recorder.start(game)
+    if stats is not None:
+        stats.start(game)
+
+# Function to start a puzzle from the daily schedule
+def daily_puzzle(puzzle):
+    global selected_cell, possible_moves
+    selected_cell = None
+    possible_moves = []
+    trajectory_points.clear()
+    set_board_size(puzzle["width"], puzzle["height"], puzzle["pawn_rows"])
+    load_puzzle(game, puzzle)
+    pygame.display.set_caption(f"Chess Puzzle Game - daily puzzle ({puzzle.get('band', 'unrated')})")
+    if recorder is not None:
+        recorder.start(game)
+    if stats is not None:
+        stats.start(game)
 
 # Function to display a message on the screen
 def display_message(message):
@@ -384,126 +247,204 @@ def draw_ui():
     screen.blit(unlimited_text, unlimited_text_rect)
 
     # Draw the steps counter
-    steps_text = font.render(f"Steps: {move_count}", True, (255, 255, 255))
+    steps_text = font.render(f"Steps: {game.move_count}", True, (255, 255, 255))
     steps_text_rect = steps_text.get_rect(topright=(WIDTH - 10, y_position))
     screen.blit(steps_text, steps_text_rect)
 
-# Initialize the game
-new_configuration()
-
-# Main game loop
-running = True
-selected_cell = None
-possible_moves = []
-move_count = 0
-
-while running:
+# Draw the board, trajectories, possible moves and UI for one frame
+def draw_frame():
     screen.fill(RED_BACKGROUND)
 
-    # Event handling
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-            pygame.quit()
-            sys.exit()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            x_mouse, y_mouse = pygame.mouse.get_pos()
-            x = x_mouse // SQUARE_SIZE
-            y = y_mouse // SQUARE_SIZE
-
-            # Button dimensions
-            button_width = 150
-            button_height = 30
-            button_spacing = 10
-            start_x = 10
-            y_position = HEIGHT - 50
-
-            # Define button rects
-            restart_rect = pygame.Rect(start_x, y_position, button_width, button_height)
-            new_config_rect = pygame.Rect(start_x + button_width + button_spacing, y_position, button_width, button_height)
-            unlimited_rect = pygame.Rect(start_x + 2 * (button_width + button_spacing), y_position, button_width + 20, button_height)
-
-            # Check if the buttons were clicked
-            if restart_rect.collidepoint(x_mouse, y_mouse):
-                restart_game()
-                continue
-            elif new_config_rect.collidepoint(x_mouse, y_mouse):
-                new_configuration()
-                continue
-            elif unlimited_rect.collidepoint(x_mouse, y_mouse):
-                unlimited_configuration()
-                continue
-
-            if y >= 8:
-                continue  # Clicked below the board
-
-            if selected_cell:
-                # Check for valid moves
-                if (x, y) in possible_moves:
-                    target_cell = board[x][y]
-
-                    # Record trajectory
-                    trajectory = get_trajectory(selected_cell, target_cell)
-                    # Update the figure's trajectory
-                    selected_cell.figure.trajectory.extend(trajectory[1:])  # Exclude starting cell to avoid duplicates
-
-                    # Move the figure to the new cell
-                    target_cell.figure = selected_cell.figure
-                    selected_cell.figure = None
-
-                    # If captures a pawn, set figure to inactive
-                    if target_cell.pawn:
-                        target_cell.pawn = False
-                        target_cell.figure.active = False
-
-                    selected_cell = None
-                    possible_moves = []
-
-                    # Increment move count
-                    move_count += 1
-
-                    # Check for game over conditions
-                    if all_pawns_destroyed():
-                        display_message(f"You won in {move_count} steps!")
-                    elif not any_possible_moves():
-                        display_message("No more possible moves.\nYou lost.")
-                else:
-                    selected_cell = None
-                    possible_moves = []
-            elif 0 <= x < 8 and 0 <= y < 8:
-                if board[x][y].figure and board[x][y].figure.active:
-                    selected_cell = board[x][y]
-                    possible_moves = get_possible_moves(selected_cell)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_r:
-                restart_game()
-
     # Draw the chessboard
-    for row in board:
+    for row in game.board:
         for cell in row:
             is_selected = selected_cell == cell
-            cell.draw(selected=is_selected)
+            draw_cell(cell, selected=is_selected)
 
     # Draw trajectories for all figures
-    for figure in figures:
-        if figure.trajectory:
-            for i in range(len(figure.trajectory) - 1):
-                start_coord = figure.trajectory[i]
-                end_coord = figure.trajectory[i + 1]
-                start_pos = (start_coord[0] * SQUARE_SIZE + SQUARE_SIZE // 2,
-                             start_coord[1] * SQUARE_SIZE + SQUARE_SIZE // 2)
-                end_pos = (end_coord[0] * SQUARE_SIZE + SQUARE_SIZE // 2,
-                           end_coord[1] * SQUARE_SIZE + SQUARE_SIZE // 2)
-                pygame.draw.line(screen, TRAJECTORY_COLOR, start_pos, end_pos, 5)
+    draw_trajectories()
 
     # Highlight possible moves with the new color
-    for x_move, y_move in possible_moves:
-        pygame.draw.rect(screen, POSSIBLE_MOVE_COLOR,
-                         (x_move * SQUARE_SIZE, y_move * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 5)
+    render.draw_possible_moves(screen, possible_moves, SQUARE_SIZE, render.line_width(SQUARE_SIZE))
 
     # Draw the UI elements (buttons and steps counter)
     draw_ui()
 
-    pygame.display.flip()
+# Show or hide the performance HUD; hiding it stops profiling unless --profile asked for it
+def toggle_hud():
+    global hud_visible, hud_panel, hud_source
+    hud_visible = not hud_visible
+    if hud_visible:
+        profiling.enable()
+    else:
+        profiling.release()
+        hud_panel = hud_source = None
+
+# Draw timing percentiles and a frame time histogram over the board
+def draw_hud(profiler):
+    global hud_panel, hud_source
+    source = profiler.hud()
+    if source is not hud_source:
+        hud_panel = render_hud_panel(*source)
+        hud_source = source
+    screen.blit(hud_panel, (10, 10))
+
+# The HUD panel for one summary from Profiler.hud()
+def render_hud_panel(lines, counts, top):
+    bar_width = 12
+    hist_height = 40
+    panel = pygame.Surface((WIDTH - 20, 18 * len(lines) + hist_height + 30), pygame.SRCALPHA)
+    panel.fill(HUD_BACKGROUND)
+    for i, line in enumerate(lines):
+        panel.blit(hud_font.render(line, True, HUD_TEXT_COLOR), (8, 8 + i * 18))
+    # Frame time histogram, buckets from 0 to the p99 frame time
+    base_y = panel.get_height() - 8
+    tallest = max(counts) or 1
+    for i, count in enumerate(counts):
+        bar_height = int(count / tallest * hist_height)
+        pygame.draw.rect(panel, HUD_TEXT_COLOR, (8 + i * (bar_width + 2), base_y - bar_height, bar_width, bar_height))
+    label = hud_font.render(f"frame 0-{top * 1000:.1f}ms", True, HUD_TEXT_COLOR)
+    panel.blit(label, (8 + len(counts) * (bar_width + 2) + 8, base_y - label.get_height()))
+    return panel
+
+def main(argv=None):
+    global selected_cell, possible_moves, recorder, stats
+    parser = argparse.ArgumentParser(description="Trajectory chess puzzle")
+    add_log_level_argument(parser)
+    profiling.add_profile_argument(parser)
+    parser.add_argument("--record", metavar="PATH", help="append played games to this record file")
+    parser.add_argument("--stats", metavar="PATH", help="append game outcomes, steps and times to this stats file")
+    parser.add_argument("--width", type=int, help="board width in squares (default 8, up to 16)")
+    parser.add_argument("--height", type=int, help="board height in squares (default 8, up to 16)")
+    parser.add_argument("--pawn-rows", type=int, help="rows of pawns (and of figures, default 1)")
+    parser.add_argument("--schedule", default=resource_path("daily.json"),
+                        help="daily puzzle schedule; today's puzzle is played first unless a board size is given")
+    args = parser.parse_args(argv)
+    # A board size on the command line wins over the daily puzzle's
+    size_given = any(value is not None for value in (args.width, args.height, args.pawn_rows))
+    board = [default if value is None else value
+             for value, default in ((args.width, 8), (args.height, 8), (args.pawn_rows, 1))]
+    try:
+        set_board_size(*board)
+    except ValueError as e:
+        parser.error(str(e))
+    configure_logging(args.log_level, config_path=resource_path("logging.ini"))
+    profiling.enable_from_env(args.profile)
+    if args.record:
+        recorder = GameRecorder(args.record)
+        atexit.register(recorder.finish)
+    if args.stats:
+        stats = StatsRecorder(args.stats)
+        atexit.register(stats.finish)
+
+    init_display()
+
+    # Initialize the game with today's puzzle, or a new configuration without one
+    puzzle = None if size_given else load_daily_puzzle(args.schedule)
+    if puzzle is not None:
+        daily_puzzle(puzzle)
+    else:
+        new_configuration()
+
+    # Main game loop
+    running = True
+    while running:
+        profiler = profiling.profiler
+        if profiler is not None:
+            frame_start = time.perf_counter()
+
+        # Event handling
+        if profiler is not None:
+            events_start = time.perf_counter()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                x_mouse, y_mouse = pygame.mouse.get_pos()
+                x = x_mouse // SQUARE_SIZE
+                y = y_mouse // SQUARE_SIZE
+
+                # Button dimensions
+                button_width = 150
+                button_height = 30
+                button_spacing = 10
+                start_x = 10
+                y_position = HEIGHT - 50
+
+                # Define button rects
+                restart_rect = pygame.Rect(start_x, y_position, button_width, button_height)
+                new_config_rect = pygame.Rect(start_x + button_width + button_spacing, y_position, button_width, button_height)
+                unlimited_rect = pygame.Rect(start_x + 2 * (button_width + button_spacing), y_position, button_width + 20, button_height)
+
+                # Check if the buttons were clicked
+                if restart_rect.collidepoint(x_mouse, y_mouse):
+                    restart_game()
+                    continue
+                elif new_config_rect.collidepoint(x_mouse, y_mouse):
+                    new_configuration()
+                    continue
+                elif unlimited_rect.collidepoint(x_mouse, y_mouse):
+                    unlimited_configuration()
+                    continue
+
+                if y >= game.height:
+                    continue  # Clicked below the board
+
+                if selected_cell:
+                    # Check for valid moves
+                    if (x, y) in possible_moves:
+                        figure = selected_cell.figure
+                        move_logger.debug("Move %d: %s (%d, %d) -> (%d, %d)", game.move_count + 1,
+                                          figure.type, selected_cell.x, selected_cell.y, x, y)
+                        if recorder is not None:
+                            recorder.add_move((selected_cell.x, selected_cell.y), (x, y))
+                        # Move the figure and record its trajectory
+                        segment = game.make_move(selected_cell, x, y)
+                        extend_trajectory_points(figure, segment)
+
+                        selected_cell = None
+                        possible_moves = []
+
+                        # Check for game over conditions
+                        message = None
+                        if game.all_pawns_destroyed():
+                            message = f"You won in {game.move_count} steps!"
+                        elif not game.any_possible_moves():
+                            message = "No more possible moves.\nYou lost."
+                        if message:
+                            if recorder is not None:
+                                recorder.finish()
+                            if stats is not None:
+                                stats.finish()
+                            display_message(message)
+                    else:
+                        selected_cell = None
+                        possible_moves = []
+                elif 0 <= x < game.width and 0 <= y < game.height:
+                    cell = game.board[x][y]
+                    if cell.figure and cell.figure.active:
+                        selected_cell = cell
+                        possible_moves = game.get_possible_moves(selected_cell)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_r:
+                    restart_game()
+                elif event.key == pygame.K_F3:
+                    toggle_hud()
+        if profiler is not None:
+            profiler.record("events", time.perf_counter() - events_start)
+
+        draw_frame()
+
+        if hud_visible and profiler is not None:
+            draw_hud(profiler)
+
+        pygame.display.flip()
+        if profiler is not None:
+            profiler.record("frame", time.perf_counter() - frame_start)
+
+    pygame.quit()
 
-pygame.quit()
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,38 @@
-import random
-import sys
+import argparse
+import logging
 import os
+import time
+# First, so the startup trace starts before Kivy loads
+from trajectory_chess.startup import add_startup_trace_argument, trace
 from kivy.app import App
-from kivy.uix.widget import Widget
+from kivy.clock import Clock
 from kivy.graphics import Color, Rectangle, Line, InstructionGroup
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.image import Image
-from kivy.uix.floatlayout import FloatLayout
 from kivy.properties import NumericProperty
-from kivy.core.window import Window
 from kivy.utils import platform
-from kivy.uix.popup import Popup
 from kivy.resources import resource_find
 from kivy.uix.relativelayout import RelativeLayout
 
-# Adjust for Android file paths
-if platform == 'android':
-    from android.storage import app_storage_path
-    app_path = app_storage_path()
-    os.chdir(app_path)
+from trajectory_chess import profiling
+from trajectory_chess.log import add_log_level_argument, configure_logging, move_logger, render_logger
+from trajectory_chess.rules import Game
+# The game-over popup, the record file and the HUD key are set up after the
+# first frame (see ChessPuzzleApp.finish_startup), so their modules are
+# imported there rather than here. The puzzle schedule is only imported
+# when a daily puzzle is wanted.
+
+trace.mark("imports")
+
+logger = logging.getLogger("trajectory_chess.kivy")
+
+# Adjust for Android file paths, called when the app starts rather than on import
+def setup_android_paths():
+    if platform == 'android':
+        from android.storage import app_storage_path
+        app_path = app_storage_path()
+        os.chdir(app_path)
 
 # Colors converted to Kivy's 0-1 range
 def rgb_to_norm(rgb_tuple):
@@ -35,37 +48,43 @@ TRAJECTORY_COLOR = rgb_to_norm((255, 255, 255))
 BUTTON_COLOR = rgb_to_norm((200, 200, 200))
 BUTTON_HOVER_COLOR = rgb_to_norm((160, 160, 160))
 POSSIBLE_MOVE_COLOR = rgb_to_norm((152, 251, 152))
-
-# Figures
-standard_figures = ["king", "queen", "rook", "rook", "bishop", "bishop", "knight", "knight"]
-all_figures = ["king", "queen", "rook", "bishop", "knight"]  # Used for unlimited configuration
-
-class Figure:
-    def __init__(self, type, initial_x, initial_y):
-        self.type = type
-        self.active = True
-        self.trajectory = []
-        self.initial_x = initial_x
-        self.initial_y = initial_y
-
-class Cell:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.figure = None
-        self.pawn = False
+HUD_TEXT_COLOR = [0, 1, 0, 1]
+
+# Key code for F3, toggles the performance HUD
+HUD_KEY = 284
+# Touches should show on screen within one frame at 60 Hz
+FRAME_BUDGET = 1 / 60.0
+
+# Image paths for the pieces, resolved once on first use; missing images stay out
+piece_images = None
+
+def get_piece_images():
+    global piece_images
+    if piece_images is None:
+        piece_images = {}
+        for piece_name in ["king", "queen", "rook", "bishop", "knight", "pawn"]:
+            image_path = resource_find(f"images/{piece_name}.png")
+            if not image_path:
+                logger.warning("Image %s.png not found. Please ensure it's in the images directory.", piece_name)
+            else:
+                logger.debug("Loading image for %s from %s", piece_name, image_path)
+                piece_images[piece_name] = image_path  # Store the path instead of texture
+    return piece_images
 
 class PiecesLayer(RelativeLayout):
     """Layer to handle chess piece images."""
     def __init__(self, game_widget, **kwargs):
         super(PiecesLayer, self).__init__(**kwargs)
         self.game_widget = game_widget
-        self.bind(size=self.update_pieces, pos=self.update_pieces)
+        # GameWidget.on_size places the pieces; the layer follows its size
         self.piece_widgets = {}  # Key: (x, y), Value: Image widget
 
     def update_pieces(self, *args):
+        if not self.game_widget.SQUARE_SIZE:
+            return  # Not laid out yet; the first on_size draws the pieces
         self.clear_widgets()
-        for row in self.game_widget.board:
+        piece_images = get_piece_images()
+        for row in self.game_widget.game.board:
             for cell in row:
                 if cell.pawn:
                     pawn_image_source = piece_images.get("pawn")
@@ -79,7 +98,7 @@ class PiecesLayer(RelativeLayout):
                         )
                         self.add_widget(pawn_image)
                     else:
-                        print("Pawn image not found. Skipping pawn rendering.")
+                        render_logger.debug("Pawn image not found. Skipping pawn rendering.")
 
                 if cell.figure:
                     figure_image_source = piece_images.get(cell.figure.type)
@@ -94,18 +113,43 @@ class PiecesLayer(RelativeLayout):
                             opacity=opacity
                         )
                         self.add_widget(figure_image)
-                        print(f"Rendering piece {cell.figure.type} at ({cell.x}, {cell.y})")
+                        render_logger.debug("Rendering piece %s at (%d, %d)", cell.figure.type, cell.x, cell.y)
                     else:
-                        print(f"Image for {cell.figure.type} not found. Skipping figure rendering.")
+                        render_logger.debug("Image for %s not found. Skipping figure rendering.", cell.figure.type)
 
 class GameWidget(RelativeLayout):
     SQUARE_SIZE = NumericProperty(0)
     move_count = NumericProperty(0)
 
-    def __init__(self, **kwargs):
+    def __init__(self, recorder=None, board=(8, 8, 1), puzzle=None, **kwargs):
         super(GameWidget, self).__init__(**kwargs)
-        self.board = []
-        self.figures = []
+        self.recorder = recorder  # Appends played games to the record file
+        self.stats = None  # Appends each game's outcome, steps and time to the stats file
+        self.puzzle = puzzle  # Daily puzzle entry to start with, if any
+        if puzzle is not None:
+            board = (puzzle["width"], puzzle["height"], puzzle["pawn_rows"])
+        # Board drawing goes into its own instruction groups so redraws
+        # replace the previous instructions instead of piling them up
+        self.board_group = InstructionGroup()
+        self.trajectory_group = InstructionGroup()
+        self.moves_group = InstructionGroup()
+        self.selection_group = InstructionGroup()
+        self.canvas.before.add(self.board_group)
+        self.canvas.before.add(self.trajectory_group)
+        self.canvas.before.add(self.moves_group)
+        self.canvas.before.add(self.selection_group)
+        # Touches redraw the selection and move outlines at once and leave the
+        # board and pieces to this trigger. With timeout 0 it runs on the next
+        # clock tick, so every change made during a frame, whichever tick it
+        # came from, is merged into one rebuild, and there is at most one
+        # rebuild per frame
+        self.redraw_trigger = Clock.create_trigger(self.redraw, 0)
+        self.pending_touch_times = []  # touch.time_start of handled touches not yet on screen
+        self.touches_over_budget = 0
+        # Cached trajectory polylines, one Line per figure, extended on each move
+        self.trajectory_lines = {}  # Key: figure, Value: Line instruction
+        self.trajectory_scale = None  # (SQUARE_SIZE, height) the lines were built for
+        self.game = Game(None, *board)  # board is (width, height, pawn_rows)
         self.selected_cell = None
         self.possible_moves = []
         # Initialize the pieces layer before starting the game
@@ -119,13 +163,23 @@ class GameWidget(RelativeLayout):
         self.init_game()
         # Bind size after initialization
         self.bind(size=self.on_size)
+        # Performance HUD, created on first toggle
+        self.hud_label = None
+        self.hud_event = None
+        self.frame_event = None
+        if profiling.profiler is not None:
+            self.frame_event = Clock.schedule_interval(self.record_frame, 0)
 
     def init_game(self):
-        self.new_configuration()
+        if self.puzzle is not None:
+            self.load_puzzle(self.puzzle)
+        else:
+            self.new_configuration()
 
     def on_size(self, *args):
         min_height = max(self.height - 50, 100)  # Ensure minimum height
-        self.SQUARE_SIZE = min(self.width, min_height) / 8.0  # Leave space for UI
+        # Leave space for UI
+        self.SQUARE_SIZE = min(self.width / self.game.width, min_height / self.game.height)
         self.draw_board()
         self.pieces_layer.update_pieces()
         self.update_ui_positions()
@@ -179,91 +233,91 @@ class GameWidget(RelativeLayout):
         self.lbl_steps.text = f"Steps: {self.move_count}"
 
     def new_configuration(self):
-        self.board = [[Cell(x, y) for y in range(8)] for x in range(8)]
-        self.figures = []
-        self.move_count = 0
         self.selected_cell = None
         self.possible_moves = []
-        self.setup_pawns()
-        self.setup_figures()
+        self.clear_trajectory_lines()
+        self.game.new_configuration()
+        if self.recorder is not None:
+            self.recorder.start(self.game)
+        if self.stats is not None:
+            self.stats.start(self.game)
+        self.move_count = self.game.move_count
+        self.draw_board()
+        self.pieces_layer.update_pieces()
+
+    def load_puzzle(self, puzzle):
+        self.selected_cell = None
+        self.possible_moves = []
+        self.clear_trajectory_lines()
+        from trajectory_chess.puzzles import load_puzzle
+        load_puzzle(self.game, puzzle)
+        if self.recorder is not None:
+            self.recorder.start(self.game)
+        if self.stats is not None:
+            self.stats.start(self.game)
+        self.move_count = self.game.move_count
         self.draw_board()
         self.pieces_layer.update_pieces()
 
     def unlimited_configuration(self):
-        self.board = [[Cell(x, y) for y in range(8)] for x in range(8)]
-        self.figures = []
-        self.move_count = 0
         self.selected_cell = None
         self.possible_moves = []
-        self.setup_pawns()
-        self.setup_unlimited_figures()
+        self.clear_trajectory_lines()
+        self.game.unlimited_configuration()
+        if self.recorder is not None:
+            self.recorder.start(self.game)
+        if self.stats is not None:
+            self.stats.start(self.game)
+        self.move_count = self.game.move_count
         self.draw_board()
         self.pieces_layer.update_pieces()
 
     def restart_game(self):
-        self.move_count = 0
         self.selected_cell = None
         self.possible_moves = []
-        for row in self.board:
-            for cell in row:
-                cell.figure = None
-                cell.pawn = False
-        self.setup_pawns()
-        for figure in self.figures:
-            figure.active = True
-            figure.trajectory = []
-            self.board[figure.initial_x][figure.initial_y].figure = figure
+        self.clear_trajectory_lines()
+        self.game.restart_game()
+        if self.recorder is not None:
+            self.recorder.start(self.game)
+        if self.stats is not None:
+            self.stats.start(self.game)
+        self.move_count = self.game.move_count
         self.draw_board()
         self.pieces_layer.update_pieces()
 
-    def setup_pawns(self):
-        for x in range(8):
-            self.board[x][0].pawn = True
-
-    def setup_figures(self):
-        random.shuffle(standard_figures)
-        for x in range(8):
-            figure = Figure(standard_figures[x], x, 7)
-            self.board[x][7].figure = figure
-            self.figures.append(figure)
-
-    def setup_unlimited_figures(self):
-        unlimited_figures = [random.choice(all_figures) for _ in range(8)]
-        for x in range(8):
-            figure = Figure(unlimited_figures[x], x, 7)
-            self.board[x][7].figure = figure
-            self.figures.append(figure)
-        # Ensure the game is winnable
-        active_figures = len(self.figures)
-        pawns = sum(1 for x in range(8) if self.board[x][0].pawn)
-        if active_figures < pawns:
-            needed_figures = pawns - active_figures
-            for _ in range(needed_figures):
-                x = random.randint(0, 7)
-                while self.board[x][7].figure is not None:
-                    x = random.randint(0, 7)
-                figure = Figure(random.choice(all_figures), x, 7)
-                self.board[x][7].figure = figure
-                self.figures.append(figure)
-
     def draw_board(self):
-        self.canvas.clear()
-        #self.canvas.before.clear()
-        with self.canvas.before:
-            # Draw background
-            Color(*RED_BACKGROUND)
-            Rectangle(pos=self.pos, size=self.size)
+        if not self.SQUARE_SIZE:
+            return  # Not laid out yet; the first on_size draws the board
+        self.board_group.clear()
+        # Draw background
+        self.board_group.add(Color(*RED_BACKGROUND))
+        self.board_group.add(Rectangle(pos=self.pos, size=self.size))
+
+        # Draw cells
+        for row in self.game.board:
+            for cell in row:
+                self.draw_cell(cell)
 
-            # Draw cells
-            for row in self.board:
-                for cell in row:
-                    self.draw_cell(cell)
+        # Draw trajectories
+        self.draw_trajectories()
 
-            # Draw trajectories
-            self.draw_trajectories()
+        # Highlight possible moves
+        self.draw_possible_moves()
+        self.draw_selection()
 
-            # Highlight possible moves
-            self.draw_possible_moves()
+    def redraw(self, *args):
+        self.draw_board()
+        self.pieces_layer.update_pieces()
+
+    def draw_selection(self):
+        self.selection_group.clear()
+        if self.selected_cell is None:
+            return
+        SQUARE_SIZE = self.SQUARE_SIZE
+        # Adjust y-coordinate
+        rect_pos = (self.selected_cell.x * SQUARE_SIZE, self.height - (self.selected_cell.y + 1) * SQUARE_SIZE)
+        self.selection_group.add(Color(*SELECTED_COLOR))
+        self.selection_group.add(Line(rectangle=(*rect_pos, SQUARE_SIZE, SQUARE_SIZE), width=2))
 
     def draw_cell(self, cell):
         x = cell.x
@@ -274,52 +328,109 @@ class GameWidget(RelativeLayout):
         rect_size = (SQUARE_SIZE, SQUARE_SIZE)
         # Draw the cell background
         if (x + y) % 2 == 0:
-            Color(*LIGHT_WOOD)
+            self.board_group.add(Color(*LIGHT_WOOD))
         else:
-            Color(*DARK_WOOD)
-        Rectangle(pos=rect_pos, size=rect_size)
-        # Highlight selected cell
-        if self.selected_cell == cell:
-            Color(*SELECTED_COLOR)
-            Line(rectangle=(*rect_pos, *rect_size), width=2)
+            self.board_group.add(Color(*DARK_WOOD))
+        self.board_group.add(Rectangle(pos=rect_pos, size=rect_size))
 
-    def draw_trajectories(self):
+    def trajectory_points(self, coords):
         SQUARE_SIZE = self.SQUARE_SIZE
-        Color(*TRAJECTORY_COLOR)
-        for figure in self.figures:
-            if figure.trajectory:
-                points = []
-                for coord in figure.trajectory:
-                    x, y = coord
-                    x_pos = x * SQUARE_SIZE + SQUARE_SIZE / 2
-                    # Adjust y-coordinate
-                    y_pos = self.height - (y * SQUARE_SIZE + SQUARE_SIZE / 2)
-                    points.extend([x_pos, y_pos])
-                if len(points) >= 4:
-                    Line(points=points, width=2)
+        points = []
+        for x, y in coords:
+            x_pos = x * SQUARE_SIZE + SQUARE_SIZE / 2
+            # Adjust y-coordinate
+            y_pos = self.height - (y * SQUARE_SIZE + SQUARE_SIZE / 2)
+            points.extend([x_pos, y_pos])
+        return points
+
+    def extend_trajectory_line(self, figure, segment):
+        # Append the new segment to the figure's cached Line
+        line = self.trajectory_lines.get(figure)
+        if line is not None:
+            line.points = line.points + self.trajectory_points(segment)
+            return
+        # The Line is created once the trajectory has two points; a king's
+        # first move gives it only one
+        points = self.trajectory_points(figure.trajectory)
+        if len(points) >= 4:
+            line = Line(points=points, width=2)
+            self.trajectory_lines[figure] = line
+            self.trajectory_group.add(line)
+
+    def clear_trajectory_lines(self):
+        self.trajectory_group.clear()
+        self.trajectory_group.add(Color(*TRAJECTORY_COLOR))
+        self.trajectory_lines = {}
+
+    def draw_trajectories(self):
+        # Lines are kept between redraws and only rescaled when the board geometry changes
+        scale = (self.SQUARE_SIZE, self.height)
+        if scale != self.trajectory_scale:
+            self.trajectory_scale = scale
+            for figure, line in self.trajectory_lines.items():
+                line.points = self.trajectory_points(figure.trajectory)
 
     def draw_possible_moves(self):
         SQUARE_SIZE = self.SQUARE_SIZE
-        Color(*POSSIBLE_MOVE_COLOR)
+        self.moves_group.clear()
+        self.moves_group.add(Color(*POSSIBLE_MOVE_COLOR))
         for x_move, y_move in self.possible_moves:
             x_pos = x_move * SQUARE_SIZE
             # Adjust y-coordinate
             y_pos = self.height - (y_move + 1) * SQUARE_SIZE
-            Line(rectangle=(x_pos, y_pos, SQUARE_SIZE, SQUARE_SIZE), width=2)
+            self.moves_group.add(Line(rectangle=(x_pos, y_pos, SQUARE_SIZE, SQUARE_SIZE), width=2))
+
+    def record_frame(self, dt):
+        profiler = profiling.profiler
+        if profiler is not None:
+            profiler.record("frame", dt)
+
+    def toggle_hud(self):
+        if self.hud_event is None:
+            profiling.enable()
+            if self.frame_event is None:
+                self.frame_event = Clock.schedule_interval(self.record_frame, 0)
+            self.hud_label = Label(size_hint=(None, None), halign="left", valign="bottom",
+                                   color=HUD_TEXT_COLOR, font_size="12sp")
+            self.add_widget(self.hud_label)
+            self.hud_event = Clock.schedule_interval(self.update_hud, 0.5)
+            self.update_hud()
+        else:
+            self.hud_event.cancel()
+            self.hud_event = None
+            self.remove_widget(self.hud_label)
+            self.hud_label = None
+            # Profiling turned on by the HUD stops with it; --profile keeps it on
+            if not profiling.release():
+                self.frame_event.cancel()
+                self.frame_event = None
+
+    def update_hud(self, *args):
+        profiler = profiling.profiler
+        profiler.set_count("widgets", sum(1 for _ in self.walk()))
+        profiler.set_count("instructions", len(self.board_group.children) +
+                           len(self.trajectory_group.children) + len(self.moves_group.children))
+        self.hud_label.text = "\n".join(profiler.hud_lines())
+        self.hud_label.texture_update()
+        self.hud_label.size = self.hud_label.texture_size
+        self.hud_label.pos = (self.spacing, self.spacing)
 
     def on_touch_down(self, touch):
+        profiler = profiling.profiler
+        if profiler is not None:
+            start = time.perf_counter()
         # Let the children widgets handle the touch first
         super(GameWidget, self).on_touch_down(touch)
 
         x_mouse, y_mouse = touch.pos
 
         # Check if touch is within the board area
-        board_height = self.SQUARE_SIZE * 8
+        board_height = self.SQUARE_SIZE * self.game.height
         if y_mouse <= self.height and y_mouse >= self.height - board_height:
             x = int(x_mouse / self.SQUARE_SIZE)
             # Adjust y-coordinate
             y = int((self.height - y_mouse) / self.SQUARE_SIZE)
-            if 0 <= x < 8 and 0 <= y < 8:
+            if 0 <= x < self.game.width and 0 <= y < self.game.height:
                 if self.selected_cell:
                     if (x, y) in self.possible_moves:
                         self.make_move(x, y)
@@ -327,151 +438,68 @@ class GameWidget(RelativeLayout):
                         self.selected_cell = None
                         self.possible_moves = []
                 else:
-                    cell = self.board[x][y]
+                    cell = self.game.board[x][y]
                     if cell.figure and cell.figure.active:
                         self.selected_cell = cell
-                        self.possible_moves = self.get_possible_moves(cell)
-                self.draw_board()
-                self.pieces_layer.update_pieces()
+                        self.possible_moves = self.game.get_possible_moves(cell)
+                # Immediate feedback; a move also changes the pieces, which make_move left to redraw_trigger
+                self.draw_selection()
+                self.draw_possible_moves()
+                if profiler is not None:
+                    self.track_presentation(touch)
+        if profiler is not None:
+            profiler.record("touch", time.perf_counter() - start)
+
+    def track_presentation(self, touch):
+        # Time from the touch event to the frame that shows its result
+        if not self.pending_touch_times:
+            from kivy.core.window import Window
+            Window.bind(on_flip=self.on_touch_presented)
+        self.pending_touch_times.append(touch.time_start)
+
+    def on_touch_presented(self, window):
+        window.unbind(on_flip=self.on_touch_presented)
+        profiler = profiling.profiler
+        now = time.time()  # The clock touch.time_start uses
+        for touch_time in self.pending_touch_times:
+            latency = now - touch_time
+            if latency > FRAME_BUDGET:
+                self.touches_over_budget += 1
+            if profiler is not None:
+                profiler.record("touch_to_present", latency)
+        self.pending_touch_times = []
+        if profiler is not None:
+            profiler.set_count("touches_over_frame", self.touches_over_budget)
 
     def make_move(self, x, y):
-        target_cell = self.board[x][y]
-        # Record trajectory
-        trajectory = self.get_trajectory(self.selected_cell, target_cell)
-        # Update the figure's trajectory
-        self.selected_cell.figure.trajectory.extend(trajectory[1:])
-        # Move the figure to the new cell
-        target_cell.figure = self.selected_cell.figure
-        self.selected_cell.figure = None
-        # If captures a pawn, set figure to inactive
-        if target_cell.pawn:
-            target_cell.pawn = False
-            target_cell.figure.active = False
+        figure = self.selected_cell.figure
+        move_logger.debug("Move %d: %s (%d, %d) -> (%d, %d)", self.game.move_count + 1,
+                          figure.type, self.selected_cell.x, self.selected_cell.y, x, y)
+        if self.recorder is not None:
+            self.recorder.add_move((self.selected_cell.x, self.selected_cell.y), (x, y))
+        # Move the figure and record its trajectory
+        segment = self.game.make_move(self.selected_cell, x, y)
+        self.extend_trajectory_line(figure, segment)
         self.selected_cell = None
         self.possible_moves = []
-        self.move_count += 1
+        self.move_count = self.game.move_count
         # Check for game over conditions
-        if self.all_pawns_destroyed():
-            self.display_message(f"You won in {self.move_count} steps!")
-        elif not self.any_possible_moves():
-            self.display_message("No more possible moves.\nYou lost.")
-        self.draw_board()
-        self.pieces_layer.update_pieces()
-
-    def get_possible_moves(self, cell):
-        moves = []
-        occupied_cells_figures, occupied_cells_pawns, trajectory_cells = self.get_occupied_cells(exclude_cell=cell)
-        other_trajectories = trajectory_cells.copy()
-        if cell.figure.trajectory:
-            other_trajectories.difference_update(cell.figure.trajectory)
-        figure_type = cell.figure.type
-        if figure_type == "knight":
-            knight_moves = [
-                (-2, -1), (-1, -2), (1, -2), (2, -1),
-                (2, 1), (1, 2), (-1, 2), (-2, 1)
-            ]
-            for dx, dy in knight_moves:
-                x, y = cell.x + dx, cell.y + dy
-                if 0 <= x < 8 and 0 <= y < 8:
-                    if ((x, y) not in occupied_cells_figures and
-                        (x, y) not in other_trajectories and
-                        (x, y) not in cell.figure.trajectory):
-                        moves.append((x, y))
-        elif figure_type == "king":
-            for dx, dy in [(-1, -1), (1, -1), (-1, 1), (1, 1), (0, 1), (1, 0), (-1, 0), (0, -1)]:
-                x, y = cell.x + dx, cell.y + dy
-                if 0 <= x < 8 and 0 <= y < 8:
-                    if ((x, y) not in occupied_cells_figures and
-                        (x, y) not in other_trajectories and
-                        (x, y) not in cell.figure.trajectory):
-                        moves.append((x, y))
-        elif figure_type in ["rook", "bishop", "queen"]:
-            directions = []
-            if figure_type == "rook":
-                directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-            elif figure_type == "bishop":
-                directions = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
-            elif figure_type == "queen":
-                directions = [(-1, -1), (1, -1), (-1, 1), (1, 1), (0, 1), (1, 0), (-1, 0), (0, -1)]
-            for dx, dy in directions:
-                for step in range(1, 8):
-                    x = cell.x + dx * step
-                    y = cell.y + dy * step
-                    if 0 <= x < 8 and 0 <= y < 8:
-                        if (x, y) in occupied_cells_figures:
-                            break
-                        if (x, y) in cell.figure.trajectory:
-                            break
-                        if (x, y) in other_trajectories:
-                            continue
-                        moves.append((x, y))
-                    else:
-                        break
-        return moves
-
-    def get_occupied_cells(self, exclude_cell=None):
-        occupied_cells_figures = set()
-        occupied_cells_pawns = set()
-        trajectory_cells = set()
-        for row in self.board:
-            for cell in row:
-                if cell.figure and cell != exclude_cell:
-                    occupied_cells_figures.add((cell.x, cell.y))
-                if cell.figure and cell.figure.trajectory:
-                    trajectory_cells.update(cell.figure.trajectory)
-                if cell.pawn:
-                    occupied_cells_pawns.add((cell.x, cell.y))
-        return occupied_cells_figures, occupied_cells_pawns, trajectory_cells
-
-    def get_trajectory(self, start_cell, end_cell):
-        trajectory = []
-        x0, y0 = start_cell.x, start_cell.y
-        x1, y1 = end_cell.x, end_cell.y
-        figure_type = start_cell.figure.type
-        if figure_type == "knight":
-            dx = x1 - x0
-            dy = y1 - y0
-            trajectory.append((x0, y0))
-            if abs(dx) == 2 and abs(dy) == 1:
-                mid_x = x0 + dx // 2
-                trajectory.append((mid_x, y0))
-            elif abs(dx) == 1 and abs(dy) == 2:
-                mid_y = y0 + dy // 2
-                trajectory.append((x0, mid_y))
-            trajectory.append((x1, y1))
-        elif figure_type in ["rook", "bishop", "queen"]:
-            dx = x1 - x0
-            dy = y1 - y0
-            steps = max(abs(dx), abs(dy))
-            dx_step = (dx // steps) if steps != 0 else 0
-            dy_step = (dy // steps) if steps != 0 else 0
-            x, y = x0, y0
-            for _ in range(steps + 1):
-                trajectory.append((x, y))
-                x += dx_step
-                y += dy_step
-        elif figure_type == "king":
-            trajectory.append((x0, y0))
-            trajectory.append((x1, y1))
-        return trajectory
-
-    def all_pawns_destroyed(self):
-        for row in self.board:
-            for cell in row:
-                if cell.pawn:
-                    return False
-        return True
-
-    def any_possible_moves(self):
-        for row in self.board:
-            for cell in row:
-                if cell.figure and cell.figure.active:
-                    possible_moves = self.get_possible_moves(cell)
-                    if possible_moves:
-                        return True
-        return False
+        message = None
+        if self.game.all_pawns_destroyed():
+            message = f"You won in {self.move_count} steps!"
+        elif not self.game.any_possible_moves():
+            message = "No more possible moves.\nYou lost."
+        if message:
+            if self.recorder is not None:
+                self.recorder.finish()
+            if self.stats is not None:
+                self.stats.finish()
+            self.display_message(message)
+        self.redraw_trigger()
 
     def display_message(self, message):
+        from kivy.uix.floatlayout import FloatLayout
+        from kivy.uix.popup import Popup
         # Create content for the popup
         content = FloatLayout()
         label = Label(text=message, size_hint=(1, 0.7), pos_hint={'x': 0, 'top': 1})
@@ -487,20 +515,85 @@ class GameWidget(RelativeLayout):
         btn_quit.bind(on_release=lambda *args: App.get_running_app().stop())
         popup.open()
 
-# Load images for the pieces
-piece_images = {}
-for piece_name in ["king", "queen", "rook", "bishop", "knight", "pawn"]:
-    image_path = resource_find(f"images/{piece_name}.png")
-    if not image_path:
-        print(f"Image {piece_name}.png not found. Please ensure it's in the images directory.")
-    else:
-        print(f"Loading image for {piece_name} from {image_path}")
-        piece_images[piece_name] = image_path  # Store the path instead of texture
-
 class ChessPuzzleApp(App):
+    board = (8, 8, 1)  # (width, height, pawn_rows), set from the command line
+    daily = True  # Start with today's puzzle; off when the command line gives a board size
+    recorder = None  # Created after the first frame, like stats
+    stats = None
+
     def build(self):
+        trace.mark("build")
+        setup_android_paths()
         self.title = "Trajectory Chess Puzzle"
-        return GameWidget()
+        # Today's puzzle from the schedule shipped with the app, if there is one
+        puzzle = None
+        if self.daily:
+            from trajectory_chess.puzzles import load_daily_puzzle
+            puzzle = load_daily_puzzle(resource_find("daily.json"))
+        self.game_widget = GameWidget(board=self.board, puzzle=puzzle)
+        trace.mark("widgets")
+        # The window exists once the app is building, so importing it here is free
+        from kivy.core.window import Window
+        Window.bind(on_flip=self.on_first_flip)
+        return self.game_widget
+
+    def on_first_flip(self, window):
+        window.unbind(on_flip=self.on_first_flip)
+        trace.mark("first_frame")
+        # Everything the first frame does not need waits for the next one
+        Clock.schedule_once(self.finish_startup, 0)
+
+    def finish_startup(self, dt):
+        from kivy.core.window import Window
+        from trajectory_chess.records import GameRecorder
+        from trajectory_chess.stats import StatsRecorder
+        self.recorder = GameRecorder(os.path.join(self.user_data_dir, "games.tcr"))
+        self.stats = StatsRecorder(os.path.join(self.user_data_dir, "stats.tcs"))
+        self.game_widget.recorder = self.recorder
+        self.game_widget.stats = self.stats
+        if not self.game_widget.game.history:
+            self.recorder.start(self.game_widget.game)
+            self.stats.start(self.game_widget.game)
+        Window.bind(on_key_down=self.on_key_down)
+        trace.mark("ready")
+        trace.finish()
+
+    def on_key_down(self, window, key, *args):
+        if key == HUD_KEY:
+            self.game_widget.toggle_hud()
+            return True
+        return False
+
+    def on_stop(self):
+        if self.recorder is not None:
+            self.recorder.finish()
+        if self.stats is not None:
+            self.stats.finish()
+        # atexit does not always run on Android, so write the profile here
+        if profiling.profiler is not None:
+            profiling.profiler.dump()
 
 if __name__ == '__main__':
+    # Kivy leaves the arguments after "--" in sys.argv, e.g. main.py -- --log-level debug
+    parser = argparse.ArgumentParser(description="Trajectory chess puzzle")
+    add_log_level_argument(parser)
+    profiling.add_profile_argument(parser)
+    add_startup_trace_argument(parser)
+    parser.add_argument("--width", type=int, help="board width in squares (default 8, up to 16)")
+    parser.add_argument("--height", type=int, help="board height in squares (default 8, up to 16)")
+    parser.add_argument("--pawn-rows", type=int, help="rows of pawns (and of figures, default 1)")
+    args, _ = parser.parse_known_args()
+    board = tuple(default if value is None else value
+                  for value, default in ((args.width, 8), (args.height, 8), (args.pawn_rows, 1)))
+    configure_logging(args.log_level,
+                      config_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "logging.ini"))
+    profiling.enable_from_env(args.profile)
+    trace.dump_path = args.startup_trace
+    try:
+        Game(None, *board)
+    except ValueError as e:
+        parser.error(str(e))
+    ChessPuzzleApp.board = board
+    # A board size on the command line wins over the daily puzzle's
+    ChessPuzzleApp.daily = all(value is None for value in (args.width, args.height, args.pawn_rows))
     ChessPuzzleApp().run()
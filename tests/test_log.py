@@ -0,0 +1,33 @@
+import argparse
+import logging
+
+import pytest
+
+from trajectory_chess import log
+
+
+def test_command_line_level_is_checked_by_argparse():
+    parser = argparse.ArgumentParser()
+    log.add_log_level_argument(parser)
+    assert parser.parse_args(["--log-level", "debug"]).log_level == logging.DEBUG
+    assert parser.parse_args(["--log-level", "off"]).log_level == log.OFF
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--log-level", "loud"])
+
+
+def test_unknown_levels_from_the_env_and_ini_fall_back(tmp_path, monkeypatch, caplog):
+    config = tmp_path / "logging.ini"
+    config.write_text("[logging]\nlevel = loud\nmoves = chatty\nrender = debug\n")
+    try:
+        logger = log.configure_logging(config_path=str(config))
+        assert logger.level == log.DEFAULT_LEVEL
+        assert log.move_logger.level == logging.NOTSET
+        assert log.render_logger.level == logging.DEBUG
+        assert "'loud'" in caplog.text and "'chatty'" in caplog.text
+
+        monkeypatch.setenv(log.ENV_VAR, "bogus")
+        assert log.configure_logging(config_path=str(config)).level == log.DEFAULT_LEVEL
+        assert "'bogus'" in caplog.text
+    finally:
+        monkeypatch.delenv(log.ENV_VAR, raising=False)
+        log.configure_logging()
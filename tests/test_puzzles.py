@@ -0,0 +1,39 @@
+import datetime
+import json
+
+from trajectory_chess.puzzles import SCHEDULE_VERSION, DailySchedule, load_daily_puzzle, puzzle_game
+
+START = datetime.date(2026, 11, 2)
+GOOD = {"width": 8, "height": 8, "pawn_rows": 1, "configuration": "60841", "pawn_layout": None, "band": "easy"}
+
+
+def write_schedule(path, puzzles):
+    path.write_text(json.dumps({"version": SCHEDULE_VERSION, "start": START.isoformat(), "puzzles": puzzles}))
+    return str(path)
+
+
+def test_invalid_entries_only_cost_their_day(tmp_path, caplog):
+    bad = [
+        {key: value for key, value in GOOD.items() if key != "configuration"},
+        dict(GOOD, pawn_layout=str(1 << 63)),  # A pawn on a figure square
+        dict(GOOD, configuration="x"),
+        dict(GOOD, width=99),
+        "not an entry",
+    ]
+    path = write_schedule(tmp_path / "daily.json", [GOOD] + bad + [GOOD])
+    schedule = DailySchedule(path)
+    assert schedule.puzzle_for(START) == GOOD
+    for offset in range(1, len(bad) + 1):
+        assert schedule.puzzle_for(START + datetime.timedelta(days=offset)) is None
+    assert schedule.puzzle_for(START + datetime.timedelta(days=len(bad) + 1)) == GOOD
+    assert caplog.text.count("invalid entry") == len(bad)
+    assert puzzle_game(GOOD).configuration_index() == 60841
+
+
+def test_unreadable_schedules_give_no_puzzle(tmp_path):
+    assert load_daily_puzzle(str(tmp_path / "missing.json")) is None
+    for content in ("[]", "{", json.dumps({"version": SCHEDULE_VERSION, "start": "2026-13-01", "puzzles": []}),
+                    json.dumps({"version": SCHEDULE_VERSION, "start": START.isoformat(), "puzzles": 3})):
+        path = tmp_path / "daily.json"
+        path.write_text(content)
+        assert load_daily_puzzle(str(path), START) is None
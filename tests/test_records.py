@@ -0,0 +1,96 @@
+import random
+
+from trajectory_chess import records
+from trajectory_chess.rules import Game
+
+
+def play_recorded_game(recorder, seed, max_moves=None):
+    """Play random moves on a new configuration, passing them to recorder; returns the game."""
+    rng = random.Random(seed)
+    game = Game(rng)
+    game.new_configuration()
+    recorder.start(game)
+    while max_moves is None or game.move_count < max_moves:
+        moves = game.all_possible_moves()
+        if game.all_pawns_destroyed() or not moves:
+            break
+        cell, (x, y) = rng.choice(moves)
+        recorder.add_move((cell.x, cell.y), (x, y))
+        game.make_move(cell, x, y)
+    recorder.finish()
+    return game
+
+
+def expected_outcome(game):
+    if game.all_pawns_destroyed():
+        return records.WON
+    if not game.any_possible_moves():
+        return records.LOST
+    return records.UNFINISHED
+
+
+def test_recorded_games_replay_to_the_same_result(tmp_path):
+    path = tmp_path / "games.tcr"
+    recorder = records.GameRecorder(path)
+    games = [play_recorded_game(recorder, seed, max_moves=None if seed % 3 else 4) for seed in range(30)]
+
+    stored = list(records.iter_records(path))
+    assert len(stored) == len(games)
+    for game, record in zip(games, stored):
+        config_index, packed = record
+        assert config_index == game.configuration_index()
+        assert records.decode_moves(packed) == game.move_list()
+        assert records.replay(record) == (expected_outcome(game), game.move_count)
+
+    counts, total_moves = records.validate_file(path)
+    assert counts[records.INVALID] == 0
+    assert total_moves == sum(game.move_count for game in games)
+
+
+def test_moves_are_on_disk_as_they_are_played(tmp_path):
+    path = tmp_path / "games.tcr"
+    game = Game(random.Random(4))
+    game.new_configuration()
+    recorder = records.GameRecorder(path)
+    recorder.start(game)
+    moves = [((0, 7), (0, 6)), ((0, 6), (0, 5))]
+    recorder.add_move(*moves[0])
+    recorder.add_move(*moves[1])
+    # The app is killed here: no finish()
+    assert path.read_bytes().endswith(records.encode_record(game.configuration_index(), moves)[:-1])
+
+
+def test_truncated_record_is_skipped_and_closed_before_the_next_game(tmp_path, caplog):
+    path = tmp_path / "games.tcr"
+    recorder = records.GameRecorder(path)
+    first = play_recorded_game(recorder, 1)
+    complete = path.read_bytes()
+    moves = [((0, 7), (0, 6)), ((0, 6), (0, 5))]
+    path.write_bytes(complete + records.encode_record(5, moves)[:-2])  # Killed while writing the second move
+
+    assert [config for config, _ in records.iter_records(path)] == [first.configuration_index()]
+    assert "truncated record" in caplog.text
+
+    second = play_recorded_game(records.GameRecorder(path), 2)
+    assert path.read_bytes().startswith(complete)
+    stored = list(records.iter_records(path))
+    assert [config for config, _ in stored] == [first.configuration_index(), 5, second.configuration_index()]
+    assert records.decode_moves(stored[1][1]) == moves[:1]
+    assert records.decode_moves(stored[2][1]) == second.move_list()
+
+
+def test_record_cut_in_its_configuration_index_is_removed(tmp_path):
+    path = tmp_path / "games.tcr"
+    first = play_recorded_game(records.GameRecorder(path), 1)
+    complete = path.read_bytes()
+    path.write_bytes(complete + records.encode_record(5 ** 7, [])[:1])
+    assert records.close_partial_record(path) == 1
+    assert path.read_bytes() == complete
+    assert [config for config, _ in records.iter_records(path)] == [first.configuration_index()]
+
+
+def test_truncated_magic_is_rewritten(tmp_path):
+    path = tmp_path / "games.tcr"
+    path.write_bytes(records.MAGIC[:2])
+    game = play_recorded_game(records.GameRecorder(path), 3)
+    assert [config for config, _ in records.iter_records(path)] == [game.configuration_index()]
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from trajectory_chess.puzzles import random_pawn_layout
+from trajectory_chess.rules import Game, reference_possible_moves
+
+# (width, height, pawn_rows), including non-square boards and several pawn rows
+BOARDS = [(8, 8, 1), (8, 8, 2), (5, 9, 2), (12, 7, 3), (16, 16, 2), (16, 5, 1), (1, 4, 2), (3, 2, 1)]
+GAMES_PER_BOARD = 25
+
+
+def check_position(game):
+    """Compare the bitmask move generation with the reference rules for every active figure."""
+    trajectories = game.trajectory_mask()
+    moves = []
+    for cell in game.active_cells():
+        expected = sorted(reference_possible_moves(game, cell))
+        assert sorted(game.get_possible_moves(cell)) == expected
+        assert sorted(game.geometry.to_coords(game.possible_moves_mask(cell, trajectories))) == expected
+        moves.extend(((cell.x, cell.y), move) for move in expected)
+    assert sorted(((cell.x, cell.y), move) for cell, move in game.all_possible_moves()) == sorted(moves)
+    assert game.any_possible_moves() == bool(moves)
+
+
+@pytest.mark.parametrize("board", BOARDS, ids="{0[0]}x{0[1]}x{0[2]}".format)
+def test_bitmask_moves_match_reference(board):
+    rng = random.Random(f"{board}")
+    game = Game(rng, *board)
+    for n in range(GAMES_PER_BOARD):
+        pawn_layout = random_pawn_layout(game, rng) if n % 2 else None
+        game.load_configuration(rng.randrange(game.configuration_count()), pawn_layout)
+        while True:
+            check_position(game)
+            moves = game.all_possible_moves()
+            if not moves or game.all_pawns_destroyed():
+                break
+            cell, (x, y) = rng.choice(moves)
+            game.make_move(cell, x, y)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import time
+
+from trajectory_chess.rules import reference_possible_moves
+from trajectory_chess.server import GameServer, estimate_move_bytes
+
+
+async def request(port, method, path, data=None):
+    """One HTTP/1.0 request to the server on localhost; returns (status, decoded JSON or None)."""
+    body = b"" if data is None else json.dumps(data).encode()
+    return await raw_request(port, f"{method} {path} HTTP/1.0\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+
+
+async def raw_request(port, data):
+    """Send data as it is; returns (status, decoded JSON or None)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(payload) if payload else None
+
+
+def run_with_server(test, **options):
+    async def main():
+        server = GameServer(hint_workers=1, hint_max_nodes=200, **options)
+        listening = await server.start("127.0.0.1", 0)
+        try:
+            await test(server, listening.sockets[0].getsockname()[1])
+        finally:
+            await server.close()
+    asyncio.run(main())
+
+
+def test_session_moves_and_hint():
+    async def test(server, port):
+        status, state = await request(port, "POST", "/sessions", {"width": 6, "height": 7, "pawn_rows": 2})
+        assert status == 201
+        assert (state["width"], state["height"], state["pawn_rows"]) == (6, 7, 2)
+        session = state["session"]
+        game = server.sessions[session].game
+
+        status, moves = await request(port, "GET", f"/sessions/{session}/possible_moves")
+        assert status == 200
+        expected = sorted([[cell.x, cell.y], list(move)]
+                          for cell in game.active_cells() for move in reference_possible_moves(game, cell))
+        assert sorted(moves["moves"]) == expected
+
+        start, target = moves["moves"][0]
+        status, state = await request(port, "POST", f"/sessions/{session}/make_move", {"from": start, "to": target})
+        assert status == 200
+        assert state["move_count"] == 1
+
+        status, error = await request(port, "POST", f"/sessions/{session}/make_move", {"from": start, "to": target})
+        assert status == 409
+        assert error == {"error": "Illegal move"}
+        status, _ = await request(port, "POST", f"/sessions/{session}/make_move", {"from": [0, 99], "to": target})
+        assert status == 400
+
+        status, hint = await request(port, "POST", f"/sessions/{session}/hint")
+        assert status == 200
+        assert hint["move_count"] == 1
+        if hint["move"] is not None:
+            cell = game.board[hint["move"]["from"][0]][hint["move"]["from"][1]]
+            assert tuple(hint["move"]["to"]) in game.get_possible_moves(cell)
+        assert server.pending_hints == 0
+
+        status, _ = await request(port, "DELETE", f"/sessions/{session}")
+        assert status == 204
+        assert server.memory_bytes == 0
+        status, _ = await request(port, "GET", f"/sessions/{session}")
+        assert status == 404
+
+    run_with_server(test)
+
+
+def test_idle_sessions_are_evicted():
+    async def test(server, port):
+        _, state = await request(port, "POST", "/sessions")
+        session = state["session"]
+        assert server.evict_idle(time.monotonic()) == 0
+        assert server.evict_idle(time.monotonic() + 61) == 1
+        status, _ = await request(port, "GET", f"/sessions/{session}")
+        assert status == 404
+
+    run_with_server(test, idle_timeout=60)
+
+
+def test_session_cap_and_memory_limit():
+    async def test(server, port):
+        for _ in range(2):
+            status, _ = await request(port, "POST", "/sessions")
+            assert status == 201
+        status, error = await request(port, "POST", "/sessions")
+        assert status == 503
+        assert error == {"error": "Too many sessions"}
+
+        server.max_sessions = 10
+        server.max_memory_bytes = server.memory_bytes
+        status, error = await request(port, "POST", "/sessions")
+        assert status == 503
+        assert error == {"error": "Server memory limit reached"}
+
+    run_with_server(test, max_sessions=2)
+
+
+def test_moves_stay_within_the_memory_limit():
+    async def test(server, port):
+        _, state = await request(port, "POST", "/sessions")
+        session = server.sessions[state["session"]]
+        _, moves = await request(port, "GET", f"/sessions/{session.id}/possible_moves")
+        (x0, y0), (x1, y1) = moves["moves"][0]
+        growth = estimate_move_bytes(session.game, session.game.board[x0][y0], x1, y1)
+
+        server.max_memory_bytes = server.memory_bytes + growth - 1
+        status, error = await request(port, "POST", f"/sessions/{session.id}/make_move",
+                                      {"from": [x0, y0], "to": [x1, y1]})
+        assert status == 507
+        assert error == {"error": "Server memory limit reached"}
+
+        server.max_memory_bytes += 1
+        status, _ = await request(port, "POST", f"/sessions/{session.id}/make_move",
+                                  {"from": [x0, y0], "to": [x1, y1]})
+        assert status == 200
+        assert server.memory_bytes == server.max_memory_bytes
+
+    run_with_server(test)
+
+
+def test_malformed_requests_get_400():
+    async def test(server, port):
+        for data in (b"GET /sessions\r\n\r\n", b"GET / HTTP/1.0 extra\r\n\r\n",
+                     b"POST /sessions HTTP/1.0\r\nContent-Length: ten\r\n\r\n",
+                     b"POST /sessions HTTP/1.0\r\nContent-Length: -4\r\n\r\n"):
+            status, _ = await raw_request(port, data)
+            assert status == 400
+
+    run_with_server(test)
+
+
+def test_hint_queue_cap_and_internal_errors():
+    async def test(server, port):
+        _, state = await request(port, "POST", "/sessions")
+        session = state["session"]
+        server.pending_hints = server.max_pending_hints
+        status, error = await request(port, "POST", f"/sessions/{session}/hint")
+        assert status == 503
+        assert error == {"error": "Too many hints queued"}
+
+        server.pending_hints = 0
+        server.pool.shutdown()
+        status, error = await request(port, "POST", f"/sessions/{session}/hint")
+        assert status == 500
+        assert error == {"error": "Internal server error"}
+        assert server.pending_hints == 0
+
+    run_with_server(test)
+
+
+def test_big_configurations_are_strings():
+    async def test(server, port):
+        configuration = str(5 ** 24 - 2)  # Past 2 ** 53
+        status, state = await request(port, "POST", "/sessions", {"width": 12, "height": 8, "pawn_rows": 2,
+                                                                  "configuration": configuration})
+        assert status == 201
+        assert state["configuration"] == configuration
+        assert server.sessions[state["session"]].game.configuration_index() == int(configuration)
+
+        pawn_layout = str(1 << 20 | 1 << 3)
+        status, state = await request(port, "POST", "/sessions", {"configuration": "7", "pawn_layout": pawn_layout})
+        assert status == 201
+        assert (state["configuration"], state["pawn_layout"]) == ("7", pawn_layout)
+        assert sorted(state["pawns"]) == [[3, 0], [4, 2]]
+        status, hint = await request(port, "POST", f"/sessions/{state['session']}/hint")
+        assert status == 200
+
+        for data in ({"configuration": "12a"}, {"configuration": 1.5}, {"pawn_layout": "1"},
+                     {"configuration": str(5 ** 8)}):
+            status, _ = await request(port, "POST", "/sessions", data)
+            assert status == 400
+
+    run_with_server(test)
@@ -0,0 +1,112 @@
+import random
+
+from trajectory_chess import stats
+from trajectory_chess.rules import Game
+
+
+def play_game(recorder, seed):
+    """Play random moves on a new configuration, passing the game to recorder; returns the game."""
+    rng = random.Random(seed)
+    game = Game(rng)
+    game.new_configuration()
+    recorder.start(game)
+    while not game.all_pawns_destroyed():
+        moves = game.all_possible_moves()
+        if not moves:
+            break
+        cell, (x, y) = rng.choice(moves)
+        game.make_move(cell, x, y)
+    recorder.finish()
+    return game
+
+
+def test_records_round_trip(tmp_path):
+    path = tmp_path / "games.tcs"
+    written = [(config_id, 1_700_000_000 + i, 1500 * i, i % 70, i % 3)
+               for i, config_id in enumerate([0, 5 ** 8 - 1, stats.HASHED_ID_BIT | 12345, 2 ** 64 - 1] * 5)]
+    for config_id, ended, milliseconds, steps, outcome in written:
+        stats.append_stats(path, config_id, outcome, steps, milliseconds / 1000, ended)
+
+    assert path.read_bytes().startswith(stats.MAGIC)
+    assert stats.record_count(path) == len(written)
+    assert list(stats.iter_stats(path)) == written
+    assert list(stats.iter_stats(path, 3, 4)) == written[3:7]
+
+    merged = stats.aggregate(path, workers=1)
+    assert merged[None].games == len(written)
+    assert merged[0].outcomes == [sum(1 for w in written if w[0] == 0 and w[4] == outcome) for outcome in range(3)]
+
+
+def test_recorder_writes_the_game(tmp_path):
+    path = tmp_path / "games.tcs"
+    game = play_game(stats.StatsRecorder(path), 1)
+    [(config_id, _, _, steps, outcome)] = stats.iter_stats(path)
+    assert config_id == stats.configuration_id(game)
+    assert steps == game.move_count
+    assert outcome == (stats.WON if game.all_pawns_destroyed() else stats.LOST)
+
+
+def test_truncated_record_is_skipped_and_cut_before_the_next_append(tmp_path, caplog):
+    path = tmp_path / "games.tcs"
+    stats.append_stats(path, 7, stats.WON, 12, 3.5, 1000)
+    complete = path.read_bytes()
+    stats.append_stats(path, 8, stats.LOST, 20, 1.0, 2000)
+    path.write_bytes(path.read_bytes()[:-5])  # An append cut short
+
+    assert stats.record_count(path) == 1
+    assert "truncated record" in caplog.text
+    assert [record[0] for record in stats.iter_stats(path)] == [7]
+    assert [record[0] for record in stats.iter_stats(path, 0, 2)] == [7]
+    assert stats.aggregate(path, workers=1)[None].games == 1
+
+    game = play_game(stats.StatsRecorder(path), 2)
+    assert path.read_bytes().startswith(complete)
+    assert [record[0] for record in stats.iter_stats(path)] == [7, stats.configuration_id(game)]
+
+
+def test_truncated_magic_is_rewritten(tmp_path):
+    path = tmp_path / "games.tcs"
+    path.write_bytes(stats.MAGIC[:2])
+    game = play_game(stats.StatsRecorder(path), 3)
+    assert [record[0] for record in stats.iter_stats(path)] == [stats.configuration_id(game)]
+
+
+def within_accuracy(estimate, values, q):
+    """Whether estimate is within the relative accuracy of the value at q's rank in the sorted values."""
+    exact = sorted(values)[int(q * (len(values) - 1))]
+    return abs(estimate - exact) <= stats.RELATIVE_ACCURACY * exact + 1e-9
+
+
+def test_quantile_sketch_accuracy():
+    rng = random.Random(0)
+    values = [rng.lognormvariate(3, 2) for _ in range(20000)]
+    sketch = stats.QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    assert sketch.count == len(values)
+    for q in (0, 0.01, 0.25, 0.5, 0.9, 0.99, 1):
+        assert within_accuracy(sketch.quantile(q), values, q)
+
+    assert stats.QuantileSketch().quantile(0.5) is None
+    with_zeros = stats.QuantileSketch()
+    for value in (0, 0, 0, 5):
+        with_zeros.add(value)
+    assert with_zeros.quantile(0.5) == 0.0
+
+
+def test_quantile_sketch_merge_is_exact():
+    rng = random.Random(1)
+    parts = [[rng.expovariate(1 / 60) for _ in range(3000)] for _ in range(4)]
+    whole = stats.QuantileSketch()
+    merged = stats.QuantileSketch()
+    for part in parts:
+        sketch = stats.QuantileSketch()
+        for value in part:
+            sketch.add(value)
+            whole.add(value)
+        merged.merge(sketch)
+    assert (merged.count, merged.zeros, merged.bins) == (whole.count, whole.zeros, whole.bins)
+    values = [value for part in parts for value in part]
+    for q in (0.5, 0.9, 0.99):
+        assert merged.quantile(q) == whole.quantile(q)
+        assert within_accuracy(merged.quantile(q), values, q)
@@ -0,0 +1,7 @@
+"""Trajectory chess puzzle: rules and headless tools.
+
+Nothing in this package opens a window or loads images at import time, so
+it can be used from tests, batch analysis and servers. The pygame front-end
+lives in game.py and the Kivy app in main.py.
+"""
+from .rules import Cell, Figure, Game, all_figures, standard_figures
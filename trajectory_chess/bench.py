@@ -0,0 +1,223 @@
+"""Benchmark suite for the engine and the pygame renderer.
+
+Run from the repository root:
+
+    python -m trajectory_chess.bench --output bench.json
+    python -m trajectory_chess.bench --compare bench.json
+
+All boards come from fixed seeds, so two runs measure the same positions.
+The expert_* benchmarks repeat the engine measurements on a 16x16 board
+with two pawn rows.
+Each benchmark is repeated and the best round is reported as operations per
+second. --compare exits with status 1 if any benchmark got slower than the
+given baseline by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from .rules import BOARD_SIZE, MAX_BOARD_SIZE, Game
+
+DEFAULT_SEED = 20240901
+CORPUS_SIZE = 200
+REPEAT = 5
+STANDARD_BOARD = (BOARD_SIZE, BOARD_SIZE, 1)
+EXPERT_BOARD = (MAX_BOARD_SIZE, MAX_BOARD_SIZE, 2)
+
+
+def random_playout(game, rng, max_moves=None):
+    """Play uniformly random legal moves until the game ends; returns True on a win."""
+    while max_moves is None or max_moves > 0:
+        if game.all_pawns_destroyed():
+            return True
+        moves = game.all_possible_moves()
+        if not moves:
+            return False
+        cell, (x, y) = rng.choice(moves)
+        game.make_move(cell, x, y)
+        if max_moves is not None:
+            max_moves -= 1
+    return game.all_pawns_destroyed()
+
+
+def midgame_corpus(seed=DEFAULT_SEED, size=CORPUS_SIZE, board=STANDARD_BOARD):
+    """Positions a few random moves into standard and unlimited games, none finished."""
+    rng = random.Random(seed)
+    corpus = []
+    while len(corpus) < size:
+        game = Game(rng, *board)
+        if len(corpus) % 2:
+            game.unlimited_configuration()
+        else:
+            game.new_configuration()
+        random_playout(game, rng, max_moves=rng.randint(3, 8))
+        if not game.all_pawns_destroyed() and game.any_possible_moves():
+            corpus.append(game)
+    return corpus
+
+
+def measure(func, repeat=REPEAT):
+    """Run func() repeat times; func returns its operation count. Reports the best round."""
+    best = None
+    ops = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return {"ops": ops, "seconds": best, "ops_per_sec": ops / best if best else 0.0}
+
+
+def bench_move_generation(corpus):
+    cells = [(game, cell) for game in corpus for row in game.board for cell in row
+             if cell.figure and cell.figure.active]
+
+    def run():
+        for game, cell in cells:
+            game.get_possible_moves(cell)
+        return len(cells)
+    return measure(run)
+
+
+def bench_any_possible_moves(corpus):
+    def run():
+        for game in corpus:
+            game.any_possible_moves()
+        return len(corpus)
+    return measure(run)
+
+
+def bench_all_pawns_destroyed(corpus):
+    def run():
+        for game in corpus:
+            game.all_pawns_destroyed()
+        return len(corpus)
+    return measure(run)
+
+
+def bench_random_games(seed, games=200):
+    def run():
+        rng = random.Random(seed)
+        for _ in range(games):
+            game = Game(rng)
+            game.new_configuration()
+            random_playout(game, rng)
+        return games
+    return measure(run)
+
+
+def bench_configuration_setup(seed, count=2000):
+    def run():
+        rng = random.Random(seed)
+        for i in range(count):
+            game = Game(rng)
+            if i % 2:
+                game.unlimited_configuration()
+            else:
+                game.new_configuration()
+        return count
+    return measure(run)
+
+
+def bench_rendering(corpus, frames=200):
+    """Frames per second of game.draw_frame() under SDL's dummy video driver."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    import game as frontend
+
+    frontend.init_display()
+    try:
+        positions = corpus[:frames] or corpus
+        # Switch the front-end to a position and load its trajectory polylines
+        def show(position):
+            frontend.game = position
+            frontend.trajectory_points.clear()
+            for figure in position.figures:
+                frontend.extend_trajectory_points(figure, figure.trajectory)
+
+        def run():
+            for i in range(frames):
+                show(positions[i % len(positions)])
+                frontend.draw_frame()
+                pygame.display.flip()
+            return frames
+        return measure(run)
+    finally:
+        pygame.quit()
+
+
+def run_benchmarks(seed=DEFAULT_SEED, corpus_size=CORPUS_SIZE, render=True):
+    corpus = midgame_corpus(seed, corpus_size)
+    expert_corpus = midgame_corpus(seed, corpus_size, EXPERT_BOARD)
+    results = {
+        "move_generation": bench_move_generation(corpus),
+        "any_possible_moves": bench_any_possible_moves(corpus),
+        "all_pawns_destroyed": bench_all_pawns_destroyed(corpus),
+        "random_games": bench_random_games(seed),
+        "configuration_setup": bench_configuration_setup(seed),
+        "expert_move_generation": bench_move_generation(expert_corpus),
+        "expert_any_possible_moves": bench_any_possible_moves(expert_corpus),
+    }
+    if render:
+        try:
+            results["render_frame"] = bench_rendering(corpus)
+        except Exception as e:  # Missing pygame or piece images should not sink the engine numbers
+            results["render_frame"] = {"skipped": f"{type(e).__name__}: {e}"}
+    return {
+        "seed": seed,
+        "corpus_size": corpus_size,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Benchmarks slower than the baseline by more than tolerance, as (name, old, new)."""
+    regressions = []
+    for name, result in report["results"].items():
+        old = baseline.get("results", {}).get(name, {}).get("ops_per_sec")
+        new = result.get("ops_per_sec")
+        if old and new is not None and new < old * (1 - tolerance):
+            regressions.append((name, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trajectory chess benchmarks")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--corpus-size", type=int, default=CORPUS_SIZE)
+    parser.add_argument("--no-render", action="store_true", help="skip the pygame rendering benchmark")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed slowdown against the baseline (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.seed, args.corpus_size, render=not args.no_render)
+    for name, result in report["results"].items():
+        if "skipped" in result:
+            print(f"{name:25} skipped ({result['skipped']})")
+        else:
+            print(f"{name:25} {result['ops_per_sec']:12.1f} ops/s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:.1f} -> {new:.1f} ops/s")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
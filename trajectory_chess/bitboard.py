@@ -0,0 +1,98 @@
+"""Precomputed bitmask tables for move generation on boards of any size.
+
+A set of squares is a Python int with bit ``y * width + x`` set for each
+square (x, y). Python ints grow as needed, so the same code handles the
+standard 8x8 board and 16x16 expert boards alike: there is no 64-square
+limit and no multi-word bookkeeping to do by hand.
+
+Geometry holds, for every square, the knight and king targets as masks and
+the eight slider rays. A slider's moves along a ray are found with one AND
+against the blockers and a lookup of the ray beyond the nearest blocker, so
+the cost does not grow with the length of the ray.
+"""
+from functools import lru_cache
+
+KNIGHT_STEPS = [(-2, -1), (-1, -2), (1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1)]
+KING_STEPS = [(-1, -1), (1, -1), (-1, 1), (1, 1), (0, 1), (1, 0), (-1, 0), (0, -1)]
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+# Direction indices into Geometry.rays for each slider
+SLIDER_DIRECTIONS = {
+    "rook": [KING_STEPS.index(d) for d in ROOK_DIRECTIONS],
+    "bishop": [KING_STEPS.index(d) for d in BISHOP_DIRECTIONS],
+    "queen": list(range(len(KING_STEPS))),
+}
+
+
+def iter_squares(mask):
+    """Square indices of the set bits of mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Geometry:
+    """Move tables for a width x height board; use geometry() to get a shared instance."""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.full = (1 << self.size) - 1
+        self.coords = [(sq % width, sq // width) for sq in range(self.size)]
+        self.knight = [self.step_mask(sq, KNIGHT_STEPS) for sq in range(self.size)]
+        self.king = [self.step_mask(sq, KING_STEPS) for sq in range(self.size)]
+        # rays[sq][d]: squares from sq (exclusive) to the edge in direction KING_STEPS[d]
+        self.rays = [[self.ray_mask(sq, dx, dy) for dx, dy in KING_STEPS] for sq in range(self.size)]
+        # A ray towards higher square indices meets its nearest blocker at the lowest set bit
+        self.ascending = [dy * width + dx > 0 for dx, dy in KING_STEPS]
+
+    def square(self, x, y):
+        return y * self.width + x
+
+    def step_mask(self, sq, steps):
+        x0, y0 = self.coords[sq]
+        mask = 0
+        for dx, dy in steps:
+            x, y = x0 + dx, y0 + dy
+            if 0 <= x < self.width and 0 <= y < self.height:
+                mask |= 1 << self.square(x, y)
+        return mask
+
+    def ray_mask(self, sq, dx, dy):
+        x, y = self.coords[sq]
+        mask = 0
+        x, y = x + dx, y + dy
+        while 0 <= x < self.width and 0 <= y < self.height:
+            mask |= 1 << self.square(x, y)
+            x, y = x + dx, y + dy
+        return mask
+
+    def slider_targets(self, sq, directions, blockers, forbidden):
+        """Squares a slider on sq can land on.
+
+        Rays stop before the first square in blockers; squares in forbidden
+        can be flown over but not landed on.
+        """
+        rays = self.rays[sq]
+        targets = 0
+        for d in directions:
+            ray = rays[d]
+            hit = ray & blockers
+            if hit:
+                if self.ascending[d]:
+                    nearest = (hit & -hit).bit_length() - 1
+                else:
+                    nearest = hit.bit_length() - 1
+                ray &= ~(self.rays[nearest][d] | (1 << nearest))
+            targets |= ray
+        return targets & ~forbidden
+
+    def to_coords(self, mask):
+        coords = self.coords
+        return [coords[sq] for sq in iter_squares(mask)]
+
+
+@lru_cache(maxsize=None)
+def geometry(width, height):
+    return Geometry(width, height)
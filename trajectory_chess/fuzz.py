@@ -0,0 +1,486 @@
+"""Differential fuzzing of the move engine against the reference rules.
+
+    python -m trajectory_chess.fuzz --cases 20000 --workers 8
+    python -m trajectory_chess.fuzz --candidate mymodule:possible_moves
+    python -m trajectory_chess.fuzz --candidate-make-move mymodule:make_move --candidate-undo-move mymodule:undo_move
+    python -m trajectory_chess.fuzz --replay failure.json
+
+Each case is a random board size, starting configuration and pawn layout,
+followed by a random game. It plays at most --max-moves moves. Alongside
+the game runs a ReferenceModel: plain sets of squares, updated move by
+move with reference_path() and without any Game method. Every position
+along the way is checked:
+
+* The board, each figure's square, trajectory and active flag, and the
+  pawns must match the model.
+* possible_moves(game, cell) must give the same squares as
+  rules.reference_possible_moves() run on the model, for every active
+  figure. all_possible_moves() and any_possible_moves() must agree.
+* The figure, pawn and trajectory bitmasks must match the board and the
+  trajectory lists.
+* For each move, trajectory(game, start, end) must be reference_path()
+  after the start square, make_move() must return that path as the new
+  segment, and ordering.segment_mask() must give the same squares.
+* undo_move() must restore the position exactly.
+
+possible_moves, trajectory, make_move and undo_move are Game's methods
+unless --candidate, --candidate-trajectory, --candidate-make-move or
+--candidate-undo-move name another function with the same arguments as
+the method, the game first.
+
+A failing case is shrunk before it is reported. The game is cut at the
+first failing position, then moves and pawns are dropped one at a time
+for as long as the case keeps failing. Cases are JSON and --replay runs one
+again. Cases are numbered from --seed, so a run is reproducible.
+
+One worker checks roughly 90-120k positions a minute with the default
+candidates, so a million a minute takes about ten workers. The run
+prints its own rate.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+from .bitboard import iter_squares
+from .ordering import segment_mask
+from .puzzles import random_pawn_layout
+from .rules import BOARD_SIZE, MAX_BOARD_SIZE, Game, reference_possible_moves
+
+MAX_MOVES = 64
+CASES = 10000
+BATCH_SIZE = 250
+STANDARD_SHARE = 0.25
+CUSTOM_SHARE = 0.5
+
+
+class Mismatch(Exception):
+    pass
+
+
+# The engine functions under test, each taking the game first
+Candidate = namedtuple("Candidate", ["possible_moves", "trajectory", "make_move", "undo_move"])
+CANDIDATE_OPTIONS = {"possible_moves": "--candidate", "trajectory": "--candidate-trajectory",
+                     "make_move": "--candidate-make-move", "undo_move": "--candidate-undo-move"}
+
+
+def game_possible_moves(game, cell):
+    return game.get_possible_moves(cell)
+
+
+def game_trajectory(game, start_cell, end_cell):
+    return game.get_trajectory(start_cell, end_cell)
+
+
+def game_make_move(game, cell, x, y):
+    return game.make_move(cell, x, y)
+
+
+def game_undo_move(game):
+    game.undo_move()
+
+
+GAME_CANDIDATE = Candidate(game_possible_moves, game_trajectory, game_make_move, game_undo_move)
+
+
+def load_candidate(specs=None):
+    """A Candidate with the functions named in specs, {field: "module:function"}, and Game's for the rest."""
+    functions = {}
+    for field, spec in (specs or {}).items():
+        if spec is not None:
+            module_name, _, function_name = spec.partition(":")
+            functions[field] = getattr(importlib.import_module(module_name), function_name)
+    return GAME_CANDIDATE._replace(**functions)
+
+
+def reference_path(figure_type, start, end):
+    """Squares a move from start to end passes through and ends on, start excluded, as the rules read.
+
+    A knight goes two squares along its long leg, turning after the first;
+    a king steps once; the sliders pass every square on their line.
+    """
+    (x0, y0), (x1, y1) = start, end
+    dx, dy = x1 - x0, y1 - y0
+    if figure_type == "knight":
+        corner = (x0 + dx // 2, y0) if abs(dx) == 2 else (x0, y0 + dy // 2)
+        return [corner, end]
+    if figure_type == "king":
+        return [end]
+    step_x, step_y = (dx > 0) - (dx < 0), (dy > 0) - (dy < 0)
+    return [(x0 + step_x * i, y0 + step_y * i) for i in range(1, max(abs(dx), abs(dy)) + 1)]
+
+
+class ModelFigure:
+    __slots__ = ["type", "square", "trajectory", "active"]
+
+    def __init__(self, type, square, trajectory, active):
+        self.type = type
+        self.square = square  # (x, y)
+        self.trajectory = trajectory  # Squares in the order they were passed
+        self.active = active
+
+
+class ReferenceModel:
+    """A game as plain sets and lists of squares, moved with reference_path() instead of Game.
+
+    Taken from the game once, at the start of a case; figures are kept in
+    game.figures order. Also stands in for the game in
+    reference_possible_moves() through ReferenceView.
+    """
+    def __init__(self, game):
+        self.width = game.width
+        self.height = game.height
+        squares = {id(cell.figure): (cell.x, cell.y) for row in game.board for cell in row if cell.figure}
+        self.figures = [ModelFigure(figure.type, squares[id(figure)], list(figure.trajectory), figure.active)
+                        for figure in game.figures]
+        self.at = {figure.square: figure for figure in self.figures}  # Key: (x, y), Value: ModelFigure
+        self.pawns = {(cell.x, cell.y) for row in game.board for cell in row if cell.pawn}
+        self.history = []  # (figure, start, path length, captured)
+
+    def cell(self, x, y):
+        """A stand-in for the Cell at (x, y), for reference_possible_moves()."""
+        return SimpleNamespace(x=x, y=y, figure=self.at.get((x, y)))
+
+    def get_occupied_cells(self, exclude_cell=None):
+        figures = set(self.at)
+        if exclude_cell is not None:
+            figures.discard((exclude_cell.x, exclude_cell.y))
+        trajectories = set()
+        for figure in self.figures:
+            trajectories.update(figure.trajectory)
+        return figures, set(self.pawns), trajectories
+
+    def make_move(self, start, end):
+        figure = self.at.pop(start)
+        path = reference_path(figure.type, start, end)
+        figure.trajectory.extend(path)
+        figure.square = end
+        self.at[end] = figure
+        captured = end in self.pawns
+        if captured:
+            self.pawns.remove(end)
+            figure.active = False
+        self.history.append((figure, start, len(path), captured))
+        return path
+
+    def undo_move(self):
+        figure, start, length, captured = self.history.pop()
+        end = figure.square
+        del figure.trajectory[len(figure.trajectory) - length:]
+        if captured:
+            self.pawns.add(end)
+            figure.active = True
+        del self.at[end]
+        figure.square = start
+        self.at[start] = figure
+
+
+def random_case(seed, max_moves=MAX_MOVES):
+    """Board, configuration and pawn layout of a case; the moves are chosen while it runs."""
+    rng = random.Random(seed)
+    if rng.random() < STANDARD_SHARE:
+        width = height = BOARD_SIZE
+    else:
+        width, height = rng.randint(1, MAX_BOARD_SIZE), rng.randint(2, MAX_BOARD_SIZE)
+    pawn_rows = rng.randint(1, height // 2)
+    game = Game(rng, width, height, pawn_rows)
+    pawn_layout = random_pawn_layout(game, rng) if rng.random() < CUSTOM_SHARE else None
+    case = {"width": width, "height": height, "pawn_rows": pawn_rows,
+            "configuration": str(rng.randrange(game.configuration_count())),
+            "pawn_layout": None if pawn_layout is None else str(pawn_layout), "moves": []}
+    return case, rng, rng.randint(0, max_moves)
+
+
+def case_game(case):
+    game = Game(None, case["width"], case["height"], case["pawn_rows"])
+    pawn_layout = case["pawn_layout"]
+    game.load_configuration(int(case["configuration"]), None if pawn_layout is None else int(pawn_layout))
+    return game
+
+
+def snapshot(game):
+    figures = tuple((figure.type, figure.active, tuple(figure.trajectory), figure.trajectory_mask)
+                    for figure in game.figures)
+    board = tuple((cell.pawn, cell.figure) for row in game.board for cell in row)
+    return game.figure_mask, game.pawn_mask, game.move_count, figures, board
+
+
+def board_squares(game):
+    """One scan of the board: ({id(figure): (x, y)}, {(x, y) of each pawn})."""
+    squares = {}
+    pawns = set()
+    for row in game.board:
+        for cell in row:
+            if cell.figure:
+                squares[id(cell.figure)] = (cell.x, cell.y)
+            if cell.pawn:
+                pawns.add((cell.x, cell.y))
+    return squares, pawns
+
+
+def check_masks(game, squares, pawns):
+    square = game.geometry.square
+    figure_mask = pawn_mask = 0
+    for x, y in squares.values():
+        figure_mask |= 1 << square(x, y)
+    for x, y in pawns:
+        pawn_mask |= 1 << square(x, y)
+    if figure_mask != game.figure_mask:
+        raise Mismatch(f"figure_mask {game.figure_mask:#x}, board has {figure_mask:#x}")
+    if pawn_mask != game.pawn_mask:
+        raise Mismatch(f"pawn_mask {game.pawn_mask:#x}, board has {pawn_mask:#x}")
+    for figure in game.figures:
+        mask = 0
+        for x, y in figure.trajectory:
+            mask |= 1 << square(x, y)
+        if mask != figure.trajectory_mask:
+            raise Mismatch(f"{figure.type} trajectory_mask {figure.trajectory_mask:#x}, trajectory has {mask:#x}")
+
+
+def check_figure(figure, square, expected, label):
+    got = (square, figure.trajectory, figure.active)
+    if got != (expected.square, expected.trajectory, expected.active):
+        raise Mismatch(f"{label}: square, trajectory, active {got}, "
+                       f"model {(expected.square, expected.trajectory, expected.active)}")
+
+
+def check_model(game, model, squares, pawns):
+    """Raise Mismatch unless the board_squares() of the game, its figures and pawns are as in the model."""
+    for figure, expected in zip(game.figures, model.figures):
+        check_figure(figure, squares.get(id(figure)), expected, figure.type)
+    if pawns != model.pawns:
+        raise Mismatch(f"pawns {sorted(pawns)}, model {sorted(model.pawns)}")
+
+
+class ReferenceView:
+    """Stands in for the game or the model in reference_possible_moves().
+
+    The reference collects the occupied squares for every figure; this
+    collects them once per position, which makes fuzzing several times
+    faster without touching the reference code.
+    """
+    def __init__(self, game):
+        self.width = game.width
+        self.height = game.height
+        self.occupied = game.get_occupied_cells()
+
+    def get_occupied_cells(self, exclude_cell=None):
+        figures, pawns, trajectories = self.occupied
+        if exclude_cell is not None:
+            figures = figures - {(exclude_cell.x, exclude_cell.y)}
+        return figures, pawns, trajectories
+
+
+def check_position(game, model, candidate):
+    """Raise Mismatch if the engine disagrees with the model and the reference; returns the reference moves."""
+    squares, pawns = board_squares(game)
+    check_masks(game, squares, pawns)
+    check_model(game, model, squares, pawns)
+    reference = ReferenceView(model)
+    moves = []
+    for cell in game.active_cells():
+        expected = sorted(reference_possible_moves(reference, model.cell(cell.x, cell.y)))
+        got = sorted(candidate.possible_moves(game, cell))
+        if got != expected:
+            raise Mismatch(f"{cell.figure.type} on ({cell.x}, {cell.y}): moves {got}, reference {expected}")
+        moves.extend((cell, move) for move in expected)
+    all_moves = sorted(((cell.x, cell.y), move) for cell, move in game.all_possible_moves())
+    if all_moves != sorted(((cell.x, cell.y), move) for cell, move in moves):
+        raise Mismatch("all_possible_moves() differs from the per-figure moves")
+    if game.any_possible_moves() != bool(moves):
+        raise Mismatch(f"any_possible_moves() is {not moves} with {len(moves)} moves")
+    return moves
+
+
+def check_move(game, model, candidate, cell, x, y):
+    """Play a move in the game and the model, checking its path, its effect and that undo_move() takes it back.
+
+    Only the moving figure and its target square are checked against the
+    model here; the next check_position() compares the whole board.
+    """
+    geometry = game.geometry
+    figure_type = cell.figure.type
+    move = f"{figure_type} ({cell.x}, {cell.y}) -> ({x}, {y})"
+    start, target = (cell.x, cell.y), (x, y)
+    expected = reference_path(figure_type, start, target)
+    trajectory = list(candidate.trajectory(game, cell, game.board[x][y]))
+    if trajectory != [start] + expected:
+        raise Mismatch(f"{move}: trajectory {trajectory}, path {[start] + expected}")
+    mask = segment_mask(geometry, figure_type, geometry.square(*start), geometry.square(*target))
+    if set(geometry.to_coords(mask)) != set(expected):
+        raise Mismatch(f"{move}: segment_mask {sorted(geometry.to_coords(mask))}, path {expected}")
+    before = snapshot(game)
+    figure = cell.figure
+    segment = list(candidate.make_move(game, cell, x, y))
+    model.make_move(start, target)
+    if segment != expected:
+        raise Mismatch(f"{move}: segment {segment}, path {expected}")
+    end_cell = game.board[x][y]
+    check_figure(figure, target if end_cell.figure is figure else None, model.at[target], move)
+    if end_cell.pawn:
+        raise Mismatch(f"{move}: pawn left on ({x}, {y})")
+    candidate.undo_move(game)
+    model.undo_move()
+    if snapshot(game) != before:
+        raise Mismatch(f"undo_move() after {move} changed the position")
+    candidate.make_move(game, game.board[cell.x][cell.y], x, y)
+    model.make_move(start, target)
+
+
+def run_case(case, candidate, rng=None, moves_left=0):
+    """Check every position of a case; returns the positions checked.
+
+    With rng, up to moves_left more random moves are chosen and appended
+    to case["moves"]. Raises Mismatch with case["moves"] cut at the failing
+    position, and ValueError if a recorded move is not legal.
+    """
+    game = case_game(case)
+    model = ReferenceModel(game)
+    coords = game.geometry.coords
+    positions = 0
+    played = []
+    try:
+        for start, target in case["moves"]:
+            moves = check_position(game, model, candidate)
+            positions += 1
+            (x0, y0), (x1, y1) = coords[start], coords[target]
+            if ((x0, y0), (x1, y1)) not in [((cell.x, cell.y), move) for cell, move in moves]:
+                raise ValueError(f"Illegal move in case: {start} -> {target}")
+            played.append([start, target])
+            check_move(game, model, candidate, game.board[x0][y0], x1, y1)
+        moves = check_position(game, model, candidate)
+        positions += 1
+        while rng is not None and moves and moves_left > 0:
+            cell, (x, y) = rng.choice(moves)
+            move = [game.geometry.square(cell.x, cell.y), game.geometry.square(x, y)]
+            played.append(move)
+            check_move(game, model, candidate, cell, x, y)
+            moves_left -= 1
+            moves = check_position(game, model, candidate)
+            positions += 1
+    finally:
+        case["moves"] = played
+    return positions
+
+
+def mismatch(case, candidate):
+    """The Mismatch message a case raises, None if it passes or is no longer legal."""
+    try:
+        run_case(dict(case), candidate)
+    except Mismatch as e:
+        return str(e)
+    except ValueError:
+        return None
+    return None
+
+
+def shrink(case, candidate):
+    """A smaller case that still fails, by dropping moves and then pawns while it keeps failing."""
+    changed = True
+    while changed:
+        changed = False
+        for i in reversed(range(len(case["moves"]))):
+            smaller = dict(case, moves=case["moves"][:i] + case["moves"][i + 1:])
+            if mismatch(smaller, candidate):
+                case, changed = smaller, True
+        pawn_mask = case_game(case).pawn_mask
+        for sq in iter_squares(pawn_mask):
+            smaller = dict(case, pawn_layout=str(pawn_mask & ~(1 << sq)))
+            if pawn_mask & ~(1 << sq) and mismatch(smaller, candidate):
+                case, changed = smaller, True
+                break
+    return case
+
+
+def fuzz_batch(task):
+    """Run cases first_seed..first_seed+count-1; returns (positions checked, [(case, message)])."""
+    first_seed, count, candidate_specs, max_moves = task
+    candidate = load_candidate(candidate_specs)
+    positions = 0
+    failures = []
+    for seed in range(first_seed, first_seed + count):
+        case, rng, moves_left = random_case(seed, max_moves)
+        try:
+            positions += run_case(case, candidate, rng, moves_left)
+        except Mismatch as e:
+            small = shrink(case, candidate)
+            failures.append((dict(small, seed=seed), mismatch(small, candidate) or str(e)))
+    return positions, failures
+
+
+def fuzz(cases=CASES, seed=0, workers=1, candidate_specs=None, max_moves=MAX_MOVES, batch_size=BATCH_SIZE):
+    """Run cases across a process pool; returns (positions checked, [(shrunk case, message)]).
+
+    candidate_specs is {Candidate field: "module:function"} for load_candidate().
+    """
+    from multiprocessing import Pool  # Replaying a case needs no pool
+    tasks = [(first, min(batch_size, seed + cases - first), candidate_specs, max_moves)
+             for first in range(seed, seed + cases, batch_size)]
+    positions = 0
+    failures = []
+    pool = Pool(workers)
+    try:
+        for batch_positions, batch_failures in pool.imap_unordered(fuzz_batch, tasks):
+            positions += batch_positions
+            failures.extend(batch_failures)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return positions, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the move engine against the reference rules")
+    parser.add_argument("--cases", type=int, default=CASES, help="random games to play")
+    parser.add_argument("--seed", type=int, default=0, help="number of the first case")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-moves", type=int, default=MAX_MOVES, help="moves per game at most")
+    parser.add_argument("--candidate", metavar="MODULE:FUNCTION", default=None,
+                        help="function(game, cell) to check instead of Game.get_possible_moves")
+    parser.add_argument("--candidate-trajectory", metavar="MODULE:FUNCTION", default=None,
+                        help="function(game, start_cell, end_cell) to check instead of Game.get_trajectory")
+    parser.add_argument("--candidate-make-move", metavar="MODULE:FUNCTION", default=None,
+                        help="function(game, cell, x, y) to check instead of Game.make_move")
+    parser.add_argument("--candidate-undo-move", metavar="MODULE:FUNCTION", default=None,
+                        help="function(game) to check instead of Game.undo_move")
+    parser.add_argument("--replay", metavar="JSON", help="check one case written by an earlier run")
+    parser.add_argument("--out", metavar="JSON", help="write the shrunk failing cases here")
+    args = parser.parse_args(argv)
+    candidate_specs = {field: getattr(args, option[2:].replace("-", "_"))
+                       for field, option in CANDIDATE_OPTIONS.items()}
+    candidate = load_candidate(candidate_specs)
+
+    if args.replay:
+        with open(args.replay) as f:
+            cases = json.load(f)
+        failing = 0
+        for case in cases if isinstance(cases, list) else [cases]:
+            message = mismatch(case, candidate)
+            failing += message is not None
+            print(f"case {case.get('seed')}: {message or 'passes'}")
+        return 1 if failing else 0
+
+    started = time.perf_counter()
+    positions, failures = fuzz(args.cases, args.seed, args.workers, candidate_specs, args.max_moves)
+    elapsed = time.perf_counter() - started
+    for case, message in sorted(failures, key=lambda failure: failure[0]["seed"]):
+        print(f"case {case['seed']}: {message}")
+        print("  " + json.dumps(case))
+    if args.out and failures:
+        with open(args.out, "w") as f:
+            json.dump([case for case, _ in failures], f, indent=1)
+    print(f"{args.cases} cases, {positions} positions in {elapsed:.1f}s "
+          f"({positions / elapsed * 60 if elapsed else 0:.0f} positions/min), {len(failures)} failing")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Logging setup shared by the front-ends and tools.
+
+Modules log through ``logging.getLogger(__name__)`` (or a name under
+``trajectory_chess``) with %-style arguments, so messages are only formatted
+when their level is enabled. Per-frame rendering and per-move events go to
+the ``render`` and ``moves`` debug channels below.
+
+Everything is quiet (WARNING) unless a level is given on the command line,
+through the TRAJECTORY_CHESS_LOG_LEVEL environment variable, or in a
+logging.ini file next to the app. No logging.ini is committed; copy
+logging.ini.example to turn on the debug channels (the debug profile in
+buildozer.spec packages the copy)::
+
+    [logging]
+    level = info
+    render = debug
+    moves = debug
+
+An unknown level on the command line is a usage error. One from the
+environment or logging.ini is logged as a warning and the default is used
+instead, so a bad setting cannot stop the app from starting.
+"""
+import argparse
+import configparser
+import logging
+import os
+
+LOGGER_NAME = "trajectory_chess"
+ENV_VAR = "TRAJECTORY_CHESS_LOG_LEVEL"
+DEFAULT_LEVEL = logging.WARNING
+OFF = logging.CRITICAL + 10
+
+# Debug channels for hot paths
+render_logger = logging.getLogger(LOGGER_NAME + ".render")
+move_logger = logging.getLogger(LOGGER_NAME + ".moves")
+
+
+def parse_level(value):
+    """Turn "debug", "off", "10" etc. into a logging level number."""
+    if isinstance(value, int):
+        return value
+    name = value.strip().upper()
+    if name == "OFF":
+        return OFF
+    if name.isdigit():
+        return int(name)
+    level = logging.getLevelName(name)
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {value}")
+    return level
+
+
+def log_level_argument(value):
+    """parse_level() for argparse."""
+    try:
+        return parse_level(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def read_config(config_path):
+    """Read the [logging] section of an ini file, {} if it is missing."""
+    parser = configparser.ConfigParser()
+    if not parser.read(config_path) or not parser.has_section("logging"):
+        return {}
+    return dict(parser.items("logging"))
+
+
+def configure_logging(level=None, config_path=None):
+    """Set the package log levels; an explicit level wins over the env var and ini file.
+
+    level comes from the command line and must be valid; unknown levels
+    from the env var or ini file are logged and replaced by the default.
+    """
+    settings = read_config(config_path) if config_path else {}
+    invalid = []  # (setting, value, level used), logged once the handler is set up
+
+    def setting_level(setting, value, default):
+        try:
+            return parse_level(value) if value else default
+        except ValueError:
+            invalid.append((setting, value, default))
+            return default
+
+    logger = logging.getLogger(LOGGER_NAME)
+    if level is not None:
+        logger.setLevel(parse_level(level))
+    elif os.environ.get(ENV_VAR):
+        logger.setLevel(setting_level(ENV_VAR, os.environ[ENV_VAR], DEFAULT_LEVEL))
+    else:
+        logger.setLevel(setting_level(f"level in {config_path}", settings.get("level"), DEFAULT_LEVEL))
+    for channel in (render_logger, move_logger):
+        name = channel.name.rsplit(".", 1)[1]
+        channel.setLevel(setting_level(f"{name} in {config_path}", settings.get(name), logging.NOTSET))
+    # Kivy installs its own handler on the root logger; only add one when nothing else did
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+        logger.addHandler(handler)
+    for setting, value, used in invalid:
+        logger.warning("Unknown log level %r for %s; using %s", value, setting, logging.getLevelName(used))
+    return logger
+
+
+def add_log_level_argument(parser):
+    parser.add_argument("--log-level", type=log_level_argument, default=None,
+                        help="debug, info, warning, error or off (default: warning)")
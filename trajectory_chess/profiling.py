@@ -0,0 +1,186 @@
+"""Optional timing instrumentation behind the performance HUD.
+
+Profiling is off unless enable() is called (``--profile`` on the command
+line, the TRAJECTORY_CHESS_PROFILE environment variable, or the HUD key).
+While it is off nothing is wrapped and the front-ends only check
+``profiling.profiler is not None`` once per frame, so it can stay in
+release builds. Hiding the HUD calls release(), which turns profiling off
+again unless the command line or the environment asked for it.
+
+Samples are kept in bounded ring buffers; summaries report percentiles and
+a coarse histogram per metric and can be dumped to JSON on exit. Each
+summary sorts a whole buffer, so the HUD recomputes them at most every
+HUD_REFRESH seconds instead of every frame.
+"""
+import atexit
+import functools
+import json
+import os
+import time
+from collections import deque
+
+from .rules import Game
+
+ENV_VAR = "TRAJECTORY_CHESS_PROFILE"
+MAX_SAMPLES = 10000
+PERCENTILES = (50, 90, 99)
+HISTOGRAM_BUCKETS = 12
+HUD_REFRESH = 0.25  # Seconds between HUD summaries
+
+# The active Profiler, None while profiling is off
+profiler = None
+
+# Engine methods timed while profiling is on
+INSTRUMENTED_METHODS = ["get_possible_moves", "any_possible_moves"]
+_original_methods = {}
+_exit_hook_registered = False
+_requested = False  # Enabled by --profile or the environment, not just by the HUD
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Profiler:
+    def __init__(self, dump_path=None, max_samples=MAX_SAMPLES):
+        self.dump_path = dump_path
+        self.max_samples = max_samples
+        self.samples = {}  # Key: metric name, Value: deque of durations in seconds
+        self.counts = {}   # Key: counter name, Value: latest value
+        self.hud_cache = None  # (lines, frame histogram counts, histogram top) from hud()
+        self.hud_time = 0.0
+
+    def record(self, name, seconds):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.max_samples)
+        samples.append(seconds)
+
+    def set_count(self, name, value):
+        self.counts[name] = value
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+        return timed
+
+    def stats(self, name, values=None):
+        """Count, mean, max and percentiles of a metric; values is its samples if already sorted."""
+        if values is None:
+            values = sorted(self.samples.get(name, ()))
+        stats = {"count": len(values),
+                 "mean": sum(values) / len(values) if values else 0.0,
+                 "max": values[-1] if values else 0.0}
+        for p in PERCENTILES:
+            stats[f"p{p}"] = percentile(values, p)
+        return stats
+
+    def histogram(self, name, buckets=HISTOGRAM_BUCKETS, sorted_values=None):
+        """Sample counts in equal-width buckets from 0 to the p99 duration."""
+        values = self.samples.get(name, ())
+        counts = [0] * buckets
+        if not values:
+            return counts, 0.0
+        if sorted_values is None:
+            sorted_values = sorted(values)
+        top = percentile(sorted_values, 99) or sorted_values[-1] or 1e-9
+        for value in values:
+            counts[min(int(value / top * buckets), buckets - 1)] += 1
+        return counts, top
+
+    def summary(self):
+        return {"timings": {name: self.stats(name) for name in sorted(self.samples)},
+                "histograms": {name: self.histogram(name)[0] for name in sorted(self.samples)},
+                "counts": dict(self.counts)}
+
+    def hud_lines(self, sorted_samples=None):
+        lines = []
+        for name in sorted(self.samples):
+            stats = self.stats(name, sorted_samples.get(name) if sorted_samples else None)
+            lines.append(f"{name}: n={stats['count']} p50={stats['p50'] * 1000:.2f}ms "
+                         f"p90={stats['p90'] * 1000:.2f}ms p99={stats['p99'] * 1000:.2f}ms "
+                         f"max={stats['max'] * 1000:.2f}ms")
+        for name in sorted(self.counts):
+            lines.append(f"{name}: {self.counts[name]}")
+        return lines
+
+    def hud(self, now=None):
+        """(HUD lines, frame histogram counts, histogram top), recomputed at most every HUD_REFRESH seconds.
+
+        The same tuple is returned until it is recomputed, so callers can
+        keep what they drew from it.
+        """
+        now = time.perf_counter() if now is None else now
+        if self.hud_cache is None or now - self.hud_time >= HUD_REFRESH:
+            sorted_samples = {name: sorted(values) for name, values in self.samples.items()}
+            counts, top = self.histogram("frame", sorted_values=sorted_samples.get("frame"))
+            self.hud_cache = (self.hud_lines(sorted_samples), counts, top)
+            self.hud_time = now
+        return self.hud_cache
+
+    def dump(self, path=None):
+        path = path or self.dump_path
+        if path:
+            with open(path, "w") as f:
+                json.dump(self.summary(), f, indent=2)
+
+
+def _dump_at_exit():
+    if profiler is not None:
+        profiler.dump()
+
+
+def enable(dump_path=None):
+    """Start profiling and time the engine's move generation; returns the Profiler."""
+    global profiler, _exit_hook_registered
+    if profiler is None:
+        profiler = Profiler(dump_path)
+        for name in INSTRUMENTED_METHODS:
+            _original_methods[name] = getattr(Game, name)
+            setattr(Game, name, profiler.wrap(name, _original_methods[name]))
+        if not _exit_hook_registered:
+            atexit.register(_dump_at_exit)
+            _exit_hook_registered = True
+    elif dump_path:
+        profiler.dump_path = dump_path
+    return profiler
+
+
+def disable():
+    global profiler, _requested
+    for name, method in _original_methods.items():
+        setattr(Game, name, method)
+    _original_methods.clear()
+    profiler = None
+    _requested = False
+
+
+def release():
+    """Disable profiling that only the HUD enabled; returns whether profiling is still on."""
+    if not _requested:
+        disable()
+    return profiler is not None
+
+
+def enable_from_env(dump_path=None):
+    """Enable profiling if a dump path was given or the environment asks for it."""
+    global _requested
+    dump_path = dump_path or os.environ.get(ENV_VAR)
+    if dump_path:
+        _requested = True
+        return enable(dump_path)
+    return None
+
+
+def add_profile_argument(parser):
+    parser.add_argument("--profile", metavar="JSON", default=None,
+                        help="record timings and write a summary to JSON on exit")
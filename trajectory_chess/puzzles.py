@@ -0,0 +1,323 @@
+"""Difficulty-rated puzzles and the daily puzzle schedule.
+
+    python -m trajectory_chess.puzzles generate --out daily.json --start 2026-11-02 --days 365
+    python -m trajectory_chess.puzzles show daily.json --date 2026-11-05
+
+generate draws random starting configurations, a --custom-share of them
+with random pawn layouts instead of the pawn rows, and rates them across a
+process pool:
+
+* steps: length of the shortest solution found by
+  search.optimal_solutions() within --max-nodes. proven is True when steps
+  is known to be the optimum: the search finished or met its lower bound.
+  Otherwise steps is only the best found and min_steps, the lower bound,
+  is where the optimum could be; with the default --max-nodes most 8x8
+  ratings are unproven, and generate reports how many.
+* solutions: distinct solutions of that length found, capped at
+  search.MAX_SOLUTIONS. Fewer solutions leave less room for mistakes.
+* failure_rate: share of --playouts games lost by a careless player, who
+  takes a capture when one keeps the puzzle winnable and otherwise plays a
+  random move that does not obviously lose (careful_playout()).
+
+The ratings are combined into a score and a band (BANDS). Each day of the
+schedule asks for the band in WEEKLY_BANDS for its weekday, so puzzles get
+harder towards the weekend. Puzzles that cannot be solved within the node
+limit are dropped. With the pawn rows nearly every configuration rates hard
+or expert; the easier bands come from custom pawn layouts.
+
+The schedule is a JSON file with a start date and one puzzle per day;
+DailySchedule looks a day up by its offset from the start. An entry that
+cannot be set up, e.g. a missing key or a pawn layout off the board, is
+logged and that day has no puzzle.
+"""
+import argparse
+import datetime
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from .rules import BOARD_SIZE, Game
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_VERSION = 1
+MAX_NODES = 2000
+PLAYOUTS = 50
+MAX_CANDIDATES = 2000
+CUSTOM_SHARE = 0.5
+# Bands with the lowest score that belongs to them, easiest first
+BANDS = [("easy", 0.0), ("medium", 6.0), ("hard", 8.5), ("expert", 10.0)]
+# Band wanted on each weekday, Monday first
+WEEKLY_BANDS = ["easy", "easy", "medium", "medium", "hard", "hard", "expert"]
+
+
+def difficulty_score(steps, pawns, solutions, failure_rate):
+    """Higher is harder, roughly 0 to 12.
+
+    Losing playouts count most. Solutions much longer than one move per
+    pawn and puzzles with a single solution add to the score.
+    """
+    score = 8.0 * failure_rate
+    score += min(3.0, steps / pawns - 1)
+    if solutions == 1:
+        score += 2.0
+    elif solutions < 5:
+        score += 1.0
+    return score
+
+
+def band_for(score):
+    name = BANDS[0][0]
+    for band, low in BANDS:
+        if score >= low:
+            name = band
+    return name
+
+
+def random_pawn_layout(game, rng):
+    """As many pawns as there are figures, on random squares clear of the figure rows.
+
+    One empty row is left in front of the figures when the board is tall
+    enough for it.
+    """
+    width, height, pawn_rows = game.width, game.height, game.pawn_rows
+    rows = height - pawn_rows - 1 if height - pawn_rows - 1 >= pawn_rows else height - pawn_rows
+    squares = rng.sample(range(width * rows), width * pawn_rows)
+    return sum(1 << sq for sq in squares)
+
+
+def careful_playout(game, rng):
+    """Play one game as a careless but not reckless player; returns True on a win.
+
+    Moves are tried in random order, captures first, and the first one after
+    which search.can_still_win() holds is played. The player loses when no
+    move passes that check.
+    """
+    from .search import can_still_win  # Only rating searches; the apps just read schedules
+    while not game.all_pawns_destroyed():
+        moves = game.all_possible_moves()
+        rng.shuffle(moves)
+        pawn_mask = game.pawn_mask
+        geometry = game.geometry
+        moves.sort(key=lambda move: not pawn_mask >> geometry.square(*move[1]) & 1)
+        for cell, (x, y) in moves:
+            game.make_move(cell, x, y)
+            if can_still_win(game):
+                break
+            game.undo_move()
+        else:
+            return False
+    return True
+
+
+def load_puzzle(game, puzzle):
+    """Set up a puzzle entry on game, which must have the puzzle's board size."""
+    pawn_layout = puzzle.get("pawn_layout")
+    game.load_configuration(int(puzzle["configuration"]), None if pawn_layout is None else int(pawn_layout))
+
+
+def puzzle_game(puzzle):
+    """A new Game set up for a puzzle entry of a schedule or a rating."""
+    game = Game(None, puzzle["width"], puzzle["height"], puzzle["pawn_rows"])
+    load_puzzle(game, puzzle)
+    return game
+
+
+def rate_puzzle(candidate, max_nodes=MAX_NODES, playouts=PLAYOUTS):
+    """Rate one candidate; returns a puzzle entry, or None if no solution was found.
+
+    candidate is ((width, height, pawn_rows), configuration index, pawn
+    layout or None, seed for the playouts).
+    """
+    from .search import optimal_solutions
+    (width, height, pawn_rows), configuration, pawn_layout, seed = candidate
+    # Strings, since the indices and layouts of big boards go past the
+    # integers a JavaScript number holds exactly (2 ** 53)
+    puzzle = {"width": width, "height": height, "pawn_rows": pawn_rows, "configuration": str(configuration),
+              "pawn_layout": None if pawn_layout is None else str(pawn_layout)}
+    game = puzzle_game(puzzle)
+    pawns = bin(game.pawn_mask).count("1")
+    result = optimal_solutions(game, max_nodes)
+    if result.steps is None:
+        return None
+    rng = random.Random(seed)
+    losses = 0
+    for _ in range(playouts):
+        if not careful_playout(game, rng):
+            losses += 1
+        game.restart_game()
+    failure_rate = losses / playouts if playouts else 0.0
+    score = difficulty_score(result.steps, pawns, result.solutions, failure_rate)
+    proven = result.complete or result.steps == result.bound
+    puzzle.update({"pawns": pawns, "steps": result.steps, "proven": proven, "min_steps": result.bound,
+                   "solutions": result.solutions, "failure_rate": round(failure_rate, 3),
+                   "score": round(score, 2), "band": band_for(score)})
+    return puzzle
+
+
+def candidates(board, seed, custom_share=CUSTOM_SHARE):
+    """Endless random candidates for rate_puzzle, custom_share of them with custom pawn layouts."""
+    rng = random.Random(seed)
+    game = Game(rng, *board)
+    while True:
+        pawn_layout = random_pawn_layout(game, rng) if rng.random() < custom_share else None
+        yield board, rng.randrange(game.configuration_count()), pawn_layout, rng.getrandbits(32)
+
+
+def bands_needed(start, days):
+    """How many puzzles of each band the days from start need."""
+    needed = {band: 0 for band, _ in BANDS}
+    for offset in range(days):
+        needed[WEEKLY_BANDS[(start + datetime.timedelta(days=offset)).weekday()]] += 1
+    return needed
+
+
+def generate_puzzles(needed, board=(BOARD_SIZE, BOARD_SIZE, 1), seed=0, custom_share=CUSTOM_SHARE, workers=1,
+                     max_nodes=MAX_NODES, playouts=PLAYOUTS, max_candidates=MAX_CANDIDATES):
+    """Rate candidates in parallel until each band has its needed count; returns puzzles by band.
+
+    Stops early after max_candidates candidates, leaving some bands short.
+    """
+    # Imported here: the apps load schedules at startup and never need a pool
+    from multiprocessing import Pool
+    found = {band: [] for band, _ in BANDS}
+    rate = functools.partial(rate_puzzle, max_nodes=max_nodes, playouts=playouts)
+    rated = 0
+    pool = Pool(workers)
+    try:
+        tasks = candidates(board, seed, custom_share)
+        while rated < max_candidates and any(len(found[band]) < count for band, count in needed.items()):
+            chunk = [task for _, task in zip(range(min(workers * 4, max_candidates - rated)), tasks)]
+            for puzzle in pool.imap_unordered(rate, chunk):
+                rated += 1
+                if puzzle is not None and len(found[puzzle["band"]]) < needed[puzzle["band"]]:
+                    found[puzzle["band"]].append(puzzle)
+            logger.info("Rated %d candidates: %s", rated,
+                        ", ".join(f"{band} {len(found[band])}/{needed[band]}" for band, _ in BANDS))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return found
+
+
+def build_schedule(start, days, found):
+    """Assign one puzzle per day, taking the nearest band with puzzles left when one runs out."""
+    order = [band for band, _ in BANDS]
+    remaining = {band: list(puzzles) for band, puzzles in found.items()}
+    puzzles = []
+    for offset in range(days):
+        day = start + datetime.timedelta(days=offset)
+        wanted = order.index(WEEKLY_BANDS[day.weekday()])
+        for band in sorted(order, key=lambda band: abs(order.index(band) - wanted)):
+            if remaining[band]:
+                if band != order[wanted]:
+                    logger.warning("No %s puzzle left for %s, using a %s one", order[wanted], day, band)
+                puzzles.append(remaining[band].pop())
+                break
+        else:
+            raise ValueError(f"Not enough puzzles for {days} days, ran out at {day}")
+    return {"version": SCHEDULE_VERSION, "start": start.isoformat(), "puzzles": puzzles}
+
+
+class DailySchedule:
+    """A schedule file loaded once; puzzle_for() is a list index by day offset.
+
+    Entries are checked when they are looked up, so a bad entry costs only
+    its own day.
+    """
+    def __init__(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get("version") != SCHEDULE_VERSION:
+            raise ValueError(f"{path} is not a version {SCHEDULE_VERSION} puzzle schedule")
+        self.start = datetime.date.fromisoformat(data["start"])
+        self.puzzles = data["puzzles"]
+        if not isinstance(self.puzzles, list):
+            raise ValueError(f"{path} has no list of puzzles")
+
+    def puzzle_for(self, day=None):
+        """The puzzle entry for day (today by default), None outside the schedule or if it is invalid."""
+        offset = ((day or datetime.date.today()) - self.start).days
+        if 0 <= offset < len(self.puzzles):
+            return self.puzzle_at(offset)
+        return None
+
+    def puzzle_at(self, offset):
+        """The entry offset days after the start; None, with a warning, if it cannot be set up."""
+        puzzle = self.puzzles[offset]
+        try:
+            puzzle_game(puzzle)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Skipping the puzzle for %s: invalid entry (%r)",
+                           self.start + datetime.timedelta(days=offset), e)
+            return None
+        return puzzle
+
+
+def load_daily_puzzle(path, day=None):
+    """Today's puzzle entry from the schedule at path, None if there is none or it cannot be read."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return DailySchedule(path).puzzle_for(day)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Could not read the puzzle schedule %s: %s", path, e)
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and inspect daily puzzle schedules")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="rate random puzzles and write a schedule")
+    generate.add_argument("--out", required=True)
+    generate.add_argument("--start", type=datetime.date.fromisoformat, default=datetime.date.today(),
+                          help="first day, YYYY-MM-DD (default: today)")
+    generate.add_argument("--days", type=int, default=365)
+    generate.add_argument("--width", type=int, default=BOARD_SIZE)
+    generate.add_argument("--height", type=int, default=BOARD_SIZE)
+    generate.add_argument("--pawn-rows", type=int, default=1)
+    generate.add_argument("--custom-share", type=float, default=CUSTOM_SHARE,
+                          help="share of candidates with random pawn squares (default: 0.5)")
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    generate.add_argument("--max-nodes", type=int, default=MAX_NODES, help="search limit per puzzle")
+    generate.add_argument("--playouts", type=int, default=PLAYOUTS, help="games per failure rate")
+    generate.add_argument("--max-candidates", type=int, default=MAX_CANDIDATES)
+    show = commands.add_parser("show", help="print the puzzle for a day")
+    show.add_argument("schedule")
+    show.add_argument("--date", type=datetime.date.fromisoformat, default=datetime.date.today())
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        puzzle = DailySchedule(args.schedule).puzzle_for(args.date)
+        print(json.dumps(puzzle, indent=2) if puzzle else f"No puzzle scheduled for {args.date}")
+        return 0 if puzzle else 1
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    board = (args.width, args.height, args.pawn_rows)
+    try:
+        Game(None, *board)
+    except ValueError as e:
+        parser.error(str(e))
+    needed = bands_needed(args.start, args.days)
+    started = time.perf_counter()
+    found = generate_puzzles(needed, board, args.seed, args.custom_share, args.workers,
+                             args.max_nodes, args.playouts, args.max_candidates)
+    schedule = build_schedule(args.start, args.days, found)
+    with open(args.out, "w") as f:
+        json.dump(schedule, f, indent=1)
+    proven = sum(puzzle["proven"] for puzzle in schedule["puzzles"])
+    print(f"{len(schedule['puzzles'])} days written to {args.out} in {time.perf_counter() - started:.1f}s; "
+          f"{proven} have proven optimal steps (raise --max-nodes for more)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
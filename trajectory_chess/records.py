@@ -0,0 +1,331 @@
+"""Compact game records and a streaming replayer.
+
+A record file starts with the magic bytes ``TCR2`` followed by one record
+per game:
+
+    varint  configuration index (Game.configuration_index)
+    2 bytes per move: from square, to square (square = y * 8 + x)
+    1 byte  0xFF, the end of the game
+
+A record is started when a game starts and each move is appended as it is
+played, so a game in progress is on disk even if the app is killed. The
+end marker is written when the game ends or is abandoned. A file can be
+read back one game at a time without loading it whole:
+
+    python -m trajectory_chess.records games.tcr --workers 8
+
+replays every game, checks each move against the rules and prints the
+outcome counts. In text form a move is written as from-to squares in
+chess-like notation, e.g. ``b1-c3``, with files a-h left to right and
+rank 1 at the bottom (y = 7).
+
+Records describe games on the standard 8x8 board with one pawn row; games
+on other board sizes are not recorded.
+
+A game cut short, e.g. when the app is killed or the disk fills, leaves a
+record without its end marker at the end of the file. Readers log a
+warning and stop before it. GameRecorder closes it before it starts the
+next record: the moves written whole are kept, as an unfinished game, and
+only a half-written move or configuration index is cut off.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from .rules import Game
+
+MAGIC = b"TCR2"
+END_OF_GAME = b"\xff"  # Never a square, so never the first byte of a move
+BOARD_SIZE = 8
+BATCH_SIZE = 4096
+
+logger = logging.getLogger(__name__)
+
+WON = "won"
+LOST = "lost"
+UNFINISHED = "unfinished"
+INVALID = "invalid"
+
+
+def square_index(x, y):
+    return y * BOARD_SIZE + x
+
+
+def square_coords(index):
+    y, x = divmod(index, BOARD_SIZE)
+    return x, y
+
+
+def square_name(x, y):
+    return f"{chr(ord('a') + x)}{BOARD_SIZE - y}"
+
+
+def move_notation(moves):
+    """Text form of a list of ((x0, y0), (x1, y1)) moves, e.g. "b1-c3 c3-c8"."""
+    return " ".join(f"{square_name(*start)}-{square_name(*end)}" for start, end in moves)
+
+
+def encode_varint(value, out):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def read_varint(f):
+    """Read a varint from a binary file, None at a clean end of file."""
+    value = 0
+    shift = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            if shift:
+                raise ValueError("Truncated record")
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def encode_move(start, end):
+    return bytes((square_index(*start), square_index(*end)))
+
+
+def encode_record(config_index, moves):
+    """Bytes for one game; moves are ((x0, y0), (x1, y1)) pairs."""
+    out = bytearray()
+    encode_varint(config_index, out)
+    for start, end in moves:
+        out += encode_move(start, end)
+    return bytes(out + END_OF_GAME)
+
+
+def append_record(path, config_index, moves):
+    with open(path, "ab") as f:
+        if f.tell() == 0:
+            f.write(MAGIC)
+        f.write(encode_record(config_index, moves))
+
+
+def read_record(f):
+    """Read (config_index, packed move bytes), None at a clean end of file; ValueError if the record is cut short.
+
+    f must be buffered, as the end marker is found with peek().
+    """
+    config_index = read_varint(f)
+    if config_index is None:
+        return None
+    moves = bytearray()
+    while True:
+        chunk = f.peek()
+        if not chunk:
+            raise ValueError("Truncated record")
+        end = chunk.find(END_OF_GAME)
+        if end < 0:
+            moves += f.read(len(chunk))
+        else:
+            moves += f.read(end)
+            f.read(1)
+            break
+    if len(moves) % 2:
+        raise ValueError("Truncated record")
+    return config_index, bytes(moves)
+
+
+def iter_records(path):
+    """Yield (config_index, packed move bytes) for each record, reading the file incrementally.
+
+    A truncated last record is logged and skipped.
+    """
+    with open(path, "rb", buffering=1 << 16) as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+        while True:
+            end = f.tell()
+            try:
+                record = read_record(f)
+            except ValueError:
+                logger.warning("%s ends with a truncated record at byte %d; it is skipped", path, end)
+                return
+            if record is None:
+                return
+            yield record
+
+
+def close_partial_record(path):
+    """End a truncated last record so the next record starts on a boundary; returns the bytes removed.
+
+    The moves of the truncated record that were written whole are kept.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r+b") as f:
+        head = f.read(len(MAGIC))
+        if head == MAGIC:
+            end = f.tell()
+            try:
+                while read_record(f) is not None:
+                    end = f.tell()
+            except ValueError:
+                pass
+        elif MAGIC.startswith(head):
+            end = 0  # Cut off while the magic was written
+        else:
+            raise ValueError(f"{path} is not a game record file")
+        size = f.seek(0, os.SEEK_END)
+        if size == end:
+            return 0
+        f.seek(end)
+        kept = 0
+        try:
+            if read_varint(f) is not None:
+                moves = f.read()
+                if max(moves, default=0) < BOARD_SIZE ** 2:
+                    kept = size - end - len(moves) % 2
+        except ValueError:
+            pass  # Cut off inside the configuration index
+        removed = size - end - kept
+        logger.warning("%s ends with a truncated record at byte %d; keeping %d bytes of it and removing %d",
+                       path, end, kept, removed)
+        f.truncate(end + kept)
+        if kept:
+            f.seek(end + kept)
+            f.write(END_OF_GAME)
+    return removed
+
+
+def decode_moves(packed):
+    return [(square_coords(packed[i]), square_coords(packed[i + 1])) for i in range(0, len(packed), 2)]
+
+
+def replay(record):
+    """Re-simulate one record; returns (outcome, number of valid moves played)."""
+    config_index, packed = record
+    game = Game()
+    try:
+        game.load_configuration(config_index)
+    except ValueError:
+        return INVALID, 0
+    for i in range(0, len(packed), 2):
+        if game.all_pawns_destroyed() or packed[i] >= BOARD_SIZE ** 2 or packed[i + 1] >= BOARD_SIZE ** 2:
+            return INVALID, game.move_count
+        x0, y0 = square_coords(packed[i])
+        x1, y1 = square_coords(packed[i + 1])
+        cell = game.board[x0][y0]
+        if not (cell.figure and cell.figure.active) or (x1, y1) not in game.get_possible_moves(cell):
+            return INVALID, game.move_count
+        game.make_move(cell, x1, y1)
+    if game.all_pawns_destroyed():
+        return WON, game.move_count
+    if not game.any_possible_moves():
+        return LOST, game.move_count
+    return UNFINISHED, game.move_count
+
+
+def _replay_batch(batch):
+    return [replay(record) for record in batch]
+
+
+def _batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_file(path, workers=1, batch_size=BATCH_SIZE):
+    """Replay every record in path; returns outcome counts and the total number of moves.
+
+    Records are read and dispatched in batches so memory stays bounded by
+    the batch size (times the number of workers), not the file size.
+    """
+    counts = {WON: 0, LOST: 0, UNFINISHED: 0, INVALID: 0}
+    total_moves = 0
+    batches = _batches(iter_records(path), batch_size)
+    if workers > 1:
+        with Pool(workers) as pool:
+            while True:
+                chunk = [batch for _, batch in zip(range(workers * 2), batches)]
+                if not chunk:
+                    break
+                for results in pool.map(_replay_batch, chunk):
+                    for outcome, moves in results:
+                        counts[outcome] += 1
+                        total_moves += moves
+    else:
+        for batch in batches:
+            for outcome, moves in _replay_batch(batch):
+                counts[outcome] += 1
+                total_moves += moves
+    return counts, total_moves
+
+
+class GameRecorder:
+    """Appends the game being played to a record file, one move at a time.
+
+    Front-ends call start() for every new or restarted game, add_move() per
+    move and finish() when the game ends; start() finishes an abandoned game.
+    start() writes the record's configuration index and add_move() writes
+    each move unbuffered, so a killed app loses no played move. Games on
+    non-standard boards are skipped. The first start() closes a truncated
+    record left at the end of the file by an earlier run.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None  # Open while a game is recorded
+        self.checked = False
+
+    def start(self, game):
+        self.finish()
+        if not game.is_standard_board():
+            return
+        if not self.checked:
+            close_partial_record(self.path)
+            self.checked = True
+        self.file = open(self.path, "ab", buffering=0)
+        header = bytearray(MAGIC if self.file.tell() == 0 else b"")
+        encode_varint(game.configuration_index(), header)
+        self.file.write(header)
+
+    def add_move(self, start, end):
+        if self.file is not None:
+            self.file.write(encode_move(start, end))
+
+    def finish(self):
+        if self.file is not None:
+            self.file.write(END_OF_GAME)
+            self.file.close()
+            self.file = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and replay game record files")
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    counts, total_moves = validate_file(args.path, args.workers, args.batch_size)
+    elapsed = time.perf_counter() - start
+    games = sum(counts.values())
+    print(f"{games} games, {total_moves} moves in {elapsed:.2f}s ({games / elapsed if elapsed else 0:.0f} games/s)")
+    for outcome, count in counts.items():
+        print(f"  {outcome}: {count}")
+    return 1 if counts[INVALID] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
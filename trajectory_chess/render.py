@@ -0,0 +1,289 @@
+"""Board drawing for the pygame front-end and the batch renderer.
+
+game.py draws its window with draw_cell(), draw_polylines() and
+draw_possible_moves(). The same functions render puzzle thumbnails and
+replays to offscreen surfaces, without opening a window:
+
+    python -m trajectory_chess.render thumbnails --out thumbs --count 1000
+    python -m trajectory_chess.render thumbnails --out expert --width 16 --height 16 --pawn-rows 2
+    python -m trajectory_chess.render replays games.tcr --out replays --format gif
+
+Each worker process sets SDL's dummy video driver, then loads and scales
+the piece sprites once. It reuses one board surface for every image it
+writes. GIF output needs Pillow; PNG only needs pygame.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import pygame
+
+from .records import iter_records, decode_moves
+from .rules import BOARD_SIZE, Game
+
+logger = logging.getLogger(__name__)
+
+# Colors
+LIGHT_WOOD = (220, 190, 140)  # Light wood color
+DARK_WOOD = (115, 74, 18)     # Dark wood color
+SELECTED_COLOR = (255, 255, 0)       # Yellow for selected figure
+TRAJECTORY_COLOR = (255, 255, 255)   # White color for trajectory
+POSSIBLE_MOVE_COLOR = (152, 251, 152)  # Pale Green for possible moves
+PLACEHOLDER_COLOR = (60, 60, 60)
+DIM_FACTOR = (100, 100, 100, 100)  # Multiplier for inactive figures
+
+THUMBNAIL_SQUARE_SIZE = 32
+GIF_FRAME_MS = 400
+
+
+def line_width(square_size):
+    return max(1, square_size // 20)
+
+
+def cell_center(coord, square_size):
+    return (coord[0] * square_size + square_size // 2,
+            coord[1] * square_size + square_size // 2)
+
+
+class SpriteCache:
+    """Piece images scaled to one square size, with dimmed copies for inactive figures.
+
+    A missing image is replaced by a lettered disc so a board can always be
+    drawn.
+    """
+    def __init__(self, square_size, image_dir="."):
+        self.square_size = square_size
+        self.image_dir = image_dir
+        self.sprites = {}  # Key: (piece name, dimmed), Value: Surface
+
+    def get(self, name, dimmed=False):
+        sprite = self.sprites.get((name, dimmed))
+        if sprite is None:
+            if dimmed:
+                sprite = self.get(name).copy()
+                sprite.fill(DIM_FACTOR, special_flags=pygame.BLEND_RGBA_MULT)
+            else:
+                sprite = self.load(name)
+            self.sprites[(name, dimmed)] = sprite
+        return sprite
+
+    def load(self, name):
+        size = (self.square_size, self.square_size)
+        image_path = os.path.join(self.image_dir, f"{name}.png")
+        try:
+            image = pygame.image.load(image_path)
+        except (FileNotFoundError, pygame.error):
+            logger.warning("Image %s not found, drawing a placeholder", image_path)
+            return self.placeholder(name)
+        logger.debug("Loading image for %s from %s", name, image_path)
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()  # Faster blits once a display exists
+        return pygame.transform.scale(image, size)
+
+    def placeholder(self, name):
+        if not pygame.font.get_init():
+            pygame.font.init()
+        size = self.square_size
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, PLACEHOLDER_COLOR, (size // 2, size // 2), size * 2 // 5)
+        letter = "N" if name == "knight" else name[0].upper()
+        text = pygame.font.Font(None, max(size * 3 // 5, 8)).render(letter, True, (255, 255, 255))
+        sprite.blit(text, text.get_rect(center=(size // 2, size // 2)))
+        return sprite
+
+
+# Draw a chessboard cell with its pawn or figure
+def draw_cell(surface, cell, square_size, sprites, selected=False):
+    rect = pygame.Rect(cell.x * square_size, cell.y * square_size, square_size, square_size)
+    if selected:
+        pygame.draw.rect(surface, SELECTED_COLOR, rect)
+    else:
+        pygame.draw.rect(surface, LIGHT_WOOD if (cell.x + cell.y) % 2 == 0 else DARK_WOOD, rect)
+    if cell.pawn:
+        surface.blit(sprites.get("pawn"), rect.topleft)
+    if cell.figure:
+        surface.blit(sprites.get(cell.figure.type, dimmed=not cell.figure.active), rect.topleft)
+
+
+# Draw trajectory polylines given in pixel coordinates
+def draw_polylines(surface, polylines, width):
+    for points in polylines:
+        if len(points) >= 2:
+            pygame.draw.lines(surface, TRAJECTORY_COLOR, False, points, width)
+
+
+# Outline the squares a selected figure can move to
+def draw_possible_moves(surface, moves, square_size, width):
+    for x_move, y_move in moves:
+        pygame.draw.rect(surface, POSSIBLE_MOVE_COLOR,
+                         (x_move * square_size, y_move * square_size, square_size, square_size), width)
+
+
+def render_board(surface, game, square_size, sprites):
+    """Draw the board, pieces and all trajectories of game onto surface."""
+    for row in game.board:
+        for cell in row:
+            draw_cell(surface, cell, square_size, sprites)
+    draw_polylines(surface, ([cell_center(coord, square_size) for coord in figure.trajectory]
+                             for figure in game.figures), line_width(square_size))
+
+
+# Per-process state for the batch workers
+_sprites = None
+_surface = None
+
+
+def _init_worker(square_size, image_dir):
+    global _sprites, _surface
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    # No pygame.init(): SDL's signal handlers would stop the pool from terminating workers
+    _sprites = SpriteCache(square_size, image_dir)
+    _surface = pygame.Surface((square_size * BOARD_SIZE, square_size * BOARD_SIZE))
+
+
+def _render(game):
+    global _surface
+    size = (_sprites.square_size * game.width, _sprites.square_size * game.height)
+    if _surface.get_size() != size:
+        _surface = pygame.Surface(size)
+    render_board(_surface, game, _sprites.square_size, _sprites)
+    return _surface
+
+
+def render_thumbnail(task):
+    """Task is ((width, height, pawn_rows), config_index, path)."""
+    board, config_index, path = task
+    game = Game(None, *board)
+    game.load_configuration(config_index)
+    pygame.image.save(_render(game), path)
+    return 1
+
+
+def render_replay(task):
+    """Write one recorded game as numbered PNG frames or a single GIF; returns the frame count.
+
+    A record with an invalid configuration index is logged and skipped.
+    """
+    config_index, packed, path, image_format = task
+    game = Game()
+    try:
+        game.load_configuration(config_index)
+    except ValueError as e:
+        logger.warning("Skipping %s: %s", path, e)
+        return 0
+    moves = decode_moves(packed)
+    if image_format == "gif":
+        frames = [_surface_to_image(_render(game))]
+    else:
+        os.makedirs(path, exist_ok=True)
+        pygame.image.save(_render(game), os.path.join(path, "frame_000.png"))
+    for i, ((x0, y0), (x1, y1)) in enumerate(moves, 1):
+        cell = game.board[x0][y0]
+        if not (cell.figure and cell.figure.active) or (x1, y1) not in game.get_possible_moves(cell):
+            break  # Stop at the first invalid move
+        game.make_move(cell, x1, y1)
+        if image_format == "gif":
+            frames.append(_surface_to_image(_render(game)))
+        else:
+            pygame.image.save(_render(game), os.path.join(path, f"frame_{i:03d}.png"))
+    if image_format == "gif":
+        frames[0].save(path, save_all=True, append_images=frames[1:], duration=GIF_FRAME_MS, loop=0)
+        return len(frames)
+    return game.move_count + 1
+
+
+def _surface_to_image(surface):
+    from PIL import Image  # Optional dependency, only needed for GIF output
+    return Image.frombytes("RGB", surface.get_size(), pygame.image.tobytes(surface, "RGB"))
+
+
+def _run(tasks, render_task, workers, square_size, image_dir, chunksize=64):
+    """Render tasks across a pool, feeding it in slices so task generators are read lazily."""
+    count = 0
+    pool = Pool(workers, initializer=_init_worker, initargs=(square_size, image_dir))
+    try:
+        tasks = iter(tasks)
+        while True:
+            chunk = [task for _, task in zip(range(workers * chunksize * 4), tasks)]
+            if not chunk:
+                break
+            count += sum(pool.imap_unordered(render_task, chunk, chunksize))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return count
+
+
+def thumbnail_tasks(board, config_indices, out_dir):
+    for config_index in config_indices:
+        yield board, config_index, os.path.join(out_dir, f"config_{config_index}.png")
+
+
+def replay_tasks(record_path, out_dir, image_format, limit=None):
+    for n, (config_index, packed) in enumerate(iter_records(record_path)):
+        if limit is not None and n >= limit:
+            return
+        name = f"game_{n:06d}.gif" if image_format == "gif" else f"game_{n:06d}"
+        yield config_index, packed, os.path.join(out_dir, name), image_format
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render puzzle thumbnails and replays offscreen")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--square-size", type=int, default=THUMBNAIL_SQUARE_SIZE)
+    parser.add_argument("--images", default=".", help="directory with the piece PNGs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    thumbnails = commands.add_parser("thumbnails", help="one PNG per starting configuration")
+    thumbnails.add_argument("--out", required=True)
+    thumbnails.add_argument("--configs", type=int, nargs="*", help="configuration indices")
+    thumbnails.add_argument("--count", type=int, default=100, help="random configurations when --configs is not given")
+    thumbnails.add_argument("--seed", type=int, default=0)
+    thumbnails.add_argument("--width", type=int, default=BOARD_SIZE)
+    thumbnails.add_argument("--height", type=int, default=BOARD_SIZE)
+    thumbnails.add_argument("--pawn-rows", type=int, default=1)
+    replays = commands.add_parser("replays", help="frames for every game in a record file")
+    replays.add_argument("records")
+    replays.add_argument("--out", required=True)
+    replays.add_argument("--format", choices=["png", "gif"], default="png")
+    replays.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+    # Checked here, as the workers would each fail on the import
+    if args.command == "replays" and args.format == "gif" and importlib.util.find_spec("PIL") is None:
+        parser.error("--format gif needs Pillow (pip install Pillow)")
+
+    os.makedirs(args.out, exist_ok=True)
+    start = time.perf_counter()
+    if args.command == "thumbnails":
+        board = (args.width, args.height, args.pawn_rows)
+        try:
+            configuration_count = Game(None, *board).configuration_count()
+        except ValueError as e:
+            parser.error(str(e))
+        config_indices = args.configs
+        invalid = [index for index in config_indices or () if not 0 <= index < configuration_count]
+        if invalid:
+            parser.error(f"--configs must be below {configuration_count} on this board: "
+                         f"{' '.join(map(str, invalid))}")
+        if not config_indices:
+            rng = random.Random(args.seed)
+            config_indices = [rng.randrange(configuration_count) for _ in range(args.count)]
+        count = _run(thumbnail_tasks(board, config_indices, args.out), render_thumbnail,
+                     args.workers, args.square_size, args.images)
+    else:
+        count = _run(replay_tasks(args.records, args.out, args.format, args.limit), render_replay,
+                     args.workers, args.square_size, args.images, chunksize=4)
+    elapsed = time.perf_counter() - start
+    print(f"{count} boards in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} boards/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""Board state and move rules shared by both front-ends.
+
+Pure Python with no display dependencies. Boards can be any size up to
+MAX_BOARD_SIZE squares on a side: pawns fill the top pawn_rows rows and the
+figures the same number of rows at the bottom. Move generation works on the
+integer bitmasks of trajectory_chess.bitboard; reference_possible_moves()
+is the plain set-based version of the same rules.
+"""
+import random
+
+from .bitboard import SLIDER_DIRECTIONS, geometry, iter_squares
+
+# Figures
+standard_figures = ["king", "queen", "rook", "rook", "bishop", "bishop", "knight", "knight"]
+all_figures = ["king", "queen", "rook", "bishop", "knight"]  # Used for unlimited configuration
+
+# Board sizes
+BOARD_SIZE = 8  # Standard board is BOARD_SIZE x BOARD_SIZE with one pawn row
+MAX_BOARD_SIZE = 16
+
+# Class for the figures
+class Figure:
+    def __init__(self, type, initial_x, initial_y):
+        self.type = type
+        self.active = True
+        self.trajectory = []
+        self.trajectory_mask = 0  # The trajectory squares as a bitmask
+        self.initial_x = initial_x
+        self.initial_y = initial_y
+
+# Class for chessboard cells
+class Cell:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.figure = None
+        self.pawn = False
+
+class Game:
+    """One puzzle: the board, its figures and the number of moves made.
+
+    rng is the random source for new configurations (the random module by
+    default); pass a seeded random.Random for reproducible setups. width,
+    height and pawn_rows give the board size and the number of pawn rows.
+    Puzzles can replace the pawn rows with a custom pawn_layout (see
+    load_configuration).
+    """
+    def __init__(self, rng=None, width=BOARD_SIZE, height=BOARD_SIZE, pawn_rows=1):
+        if not (1 <= width <= MAX_BOARD_SIZE and 2 <= height <= MAX_BOARD_SIZE):
+            raise ValueError(f"Board size must be between 1x2 and {MAX_BOARD_SIZE}x{MAX_BOARD_SIZE}: {width}x{height}")
+        if not 1 <= pawn_rows <= height // 2:
+            raise ValueError(f"Invalid number of pawn rows for a board {height} high: {pawn_rows}")
+        self.rng = rng if rng is not None else random
+        self.width = width
+        self.height = height
+        self.pawn_rows = pawn_rows
+        self.geometry = geometry(width, height)
+        self.board = []
+        self.figures = []
+        self.move_count = 0
+        # (start cell, target cell, segment length, captured pawn, previous trajectory mask)
+        # per move, for undo_move
+        self.history = []
+        # Squares holding a figure (active or not) and squares holding a pawn
+        self.figure_mask = 0
+        self.pawn_mask = 0
+        # The figures' starting rows: the last pawn_rows rows of squares
+        self.start_mask = self.geometry.full & ~((1 << (width * (height - pawn_rows))) - 1)
+        # Bitmask of the pawn squares, None for the top pawn_rows rows
+        self.pawn_layout = None
+
+    # True for the standard 8x8 board with one row of pawns
+    def is_standard_board(self):
+        return (self.width, self.height, self.pawn_rows) == (BOARD_SIZE, BOARD_SIZE, 1) and self.pawn_layout is None
+
+    # Starting squares of the figures in configuration order: bottom row first, left to right
+    def figure_squares(self):
+        return [(x, self.height - 1 - row) for row in range(self.pawn_rows) for x in range(self.width)]
+
+    # Number of distinct configuration indices for this board
+    def configuration_count(self):
+        return len(all_figures) ** (self.width * self.pawn_rows)
+
+    # Empty the board and forget the figures and moves
+    def clear_board(self):
+        self.board = [[Cell(x, y) for y in range(self.height)] for x in range(self.width)]
+        self.figures = []
+        self.move_count = 0
+        self.history = []
+        self.figure_mask = 0
+        self.pawn_mask = 0
+
+    # Create a new game with new standard configuration
+    def new_configuration(self):
+        self.pawn_layout = None
+        self.clear_board()
+        self.setup_pawns()
+        self.setup_figures()
+
+    # Create a new game with unlimited configuration
+    def unlimited_configuration(self):
+        self.pawn_layout = None
+        self.clear_board()
+        self.setup_pawns()
+        self.setup_unlimited_figures()
+
+    # Create a new game from a configuration index (see configuration_index), optionally
+    # with pawns on the squares of the pawn_layout bitmask instead of the top rows
+    def load_configuration(self, index, pawn_layout=None):
+        if not 0 <= index < self.configuration_count():
+            raise ValueError(f"Configuration index out of range: {index}")
+        if pawn_layout is not None:
+            if not pawn_layout or pawn_layout & ~self.geometry.full or pawn_layout & self.start_mask:
+                raise ValueError("Pawn layout must be a non-empty set of squares outside the figure rows")
+            if bin(pawn_layout).count("1") > self.width * self.pawn_rows:
+                raise ValueError("Pawn layout has more pawns than there are figures")
+        self.pawn_layout = pawn_layout
+        self.clear_board()
+        self.setup_pawns()
+        for x, y in self.figure_squares():
+            index, digit = divmod(index, len(all_figures))
+            figure = Figure(all_figures[digit], x, y)
+            self.board[x][y].figure = figure
+            self.figures.append(figure)
+        self.figure_mask |= self.start_mask
+
+    # Number the starting rows by reading the figure types as base-5 digits in
+    # figure_squares() order, first square least significant.
+    # Standard and unlimited configurations share the same numbering.
+    def configuration_index(self):
+        order = {square: i for i, square in enumerate(self.figure_squares())}
+        index = 0
+        for figure in sorted(self.figures, key=lambda figure: order[(figure.initial_x, figure.initial_y)],
+                             reverse=True):
+            index = index * len(all_figures) + all_figures.index(figure.type)
+        return index
+
+    # Restart the game with the existing configuration
+    def restart_game(self):
+        self.move_count = 0
+        self.history = []
+        self.figure_mask = 0
+        self.pawn_mask = 0
+        # Reset figures and pawns on the board
+        for row in self.board:
+            for cell in row:
+                cell.figure = None
+                cell.pawn = False
+        self.setup_pawns()
+        # Reset figures to initial positions
+        for figure in self.figures:
+            figure.active = True
+            figure.trajectory = []
+            figure.trajectory_mask = 0
+            self.board[figure.initial_x][figure.initial_y].figure = figure
+            self.figure_mask |= 1 << self.geometry.square(figure.initial_x, figure.initial_y)
+
+    # Set up pawns on the top rows (y < pawn_rows) or on the custom pawn layout
+    def setup_pawns(self):
+        if self.pawn_layout is not None:
+            for x, y in self.geometry.to_coords(self.pawn_layout):
+                self.board[x][y].pawn = True
+            self.pawn_mask = self.pawn_layout
+            return
+        for y in range(self.pawn_rows):
+            for x in range(self.width):
+                self.board[x][y].pawn = True
+        self.pawn_mask = (1 << (self.width * self.pawn_rows)) - 1  # The first pawn_rows rows of squares
+
+    # Set up figures on the bottom rows, one per pawn
+    def setup_figures(self):
+        squares = self.figure_squares()
+        # The standard set, repeated to fill boards wider than 8 or with more rows
+        figure_types = standard_figures * -(-len(squares) // len(standard_figures))
+        del figure_types[len(squares):]
+        self.rng.shuffle(figure_types)  # Shuffle the standard set
+        for figure_type, (x, y) in zip(figure_types, squares):
+            figure = Figure(figure_type, x, y)
+            self.board[x][y].figure = figure
+            self.figures.append(figure)
+        self.figure_mask |= self.start_mask
+
+    # Set up unlimited figures on the bottom rows
+    def setup_unlimited_figures(self):
+        squares = self.figure_squares()
+        # Randomly choose figures, could be duplicates
+        unlimited_figures = [self.rng.choice(all_figures) for _ in squares]
+        for figure_type, (x, y) in zip(unlimited_figures, squares):
+            figure = Figure(figure_type, x, y)
+            self.board[x][y].figure = figure
+            self.figures.append(figure)
+        self.figure_mask |= self.start_mask
+        # Ensure the game is winnable by having at least as many active figures as pawns
+        active_figures = len(self.figures)
+        pawns = bin(self.pawn_mask).count("1")
+        if active_figures < pawns:
+            # Add more figures until the number of active figures is at least the number of pawns
+            needed_figures = pawns - active_figures
+            for _ in range(needed_figures):
+                x, y = self.rng.choice(squares)
+                while self.board[x][y].figure is not None:
+                    x, y = self.rng.choice(squares)
+                figure = Figure(self.rng.choice(all_figures), x, y)
+                self.board[x][y].figure = figure
+                self.figures.append(figure)
+                self.figure_mask |= 1 << self.geometry.square(x, y)
+
+    # Get all occupied cells and trajectory cells
+    def get_occupied_cells(self, exclude_cell=None):
+        occupied_cells_figures = set()
+        occupied_cells_pawns = set()
+        trajectory_cells = set()
+        for row in self.board:
+            for cell in row:
+                if cell.figure and cell != exclude_cell:
+                    occupied_cells_figures.add((cell.x, cell.y))
+                if cell.figure and cell.figure.trajectory:
+                    trajectory_cells.update(cell.figure.trajectory)
+                if cell.pawn:
+                    occupied_cells_pawns.add((cell.x, cell.y))
+        return occupied_cells_figures, occupied_cells_pawns, trajectory_cells
+
+    # Get the trajectory between two cells
+    def get_trajectory(self, start_cell, end_cell):
+        trajectory = []
+        x0, y0 = start_cell.x, start_cell.y
+        x1, y1 = end_cell.x, end_cell.y
+        figure_type = start_cell.figure.type
+
+        if figure_type == "knight":
+            # For knight, include the L-shape path
+            dx = x1 - x0
+            dy = y1 - y0
+            trajectory.append((x0, y0))
+            if abs(dx) == 2 and abs(dy) == 1:
+                mid_x = x0 + dx // 2
+                trajectory.append((mid_x, y0))
+            elif abs(dx) == 1 and abs(dy) == 2:
+                mid_y = y0 + dy // 2
+                trajectory.append((x0, mid_y))
+            trajectory.append((x1, y1))
+        elif figure_type in ["rook", "bishop", "queen"]:
+            dx = x1 - x0
+            dy = y1 - y0
+            steps = max(abs(dx), abs(dy))
+            dx_step = (dx // steps) if steps != 0 else 0
+            dy_step = (dy // steps) if steps != 0 else 0
+            x, y = x0, y0
+            for _ in range(steps + 1):
+                trajectory.append((x, y))
+                x += dx_step
+                y += dy_step
+        elif figure_type == "king":
+            trajectory.append((x0, y0))
+            trajectory.append((x1, y1))
+        return trajectory
+
+    # Union of all figures' trajectories as a bitmask
+    def trajectory_mask(self):
+        mask = 0
+        for figure in self.figures:
+            mask |= figure.trajectory_mask
+        return mask
+
+    # Bitmask of the squares the figure on cell can move to, given the trajectory union
+    def possible_moves_mask(self, cell, trajectories):
+        geometry = self.geometry
+        figure = cell.figure
+        sq = geometry.square(cell.x, cell.y)
+        figures = self.figure_mask & ~(1 << sq)
+        if figure.type == "knight":
+            return geometry.knight[sq] & ~(figures | trajectories)
+        if figure.type == "king":
+            return geometry.king[sq] & ~(figures | trajectories)
+        directions = SLIDER_DIRECTIONS.get(figure.type)
+        if directions is None:
+            return 0
+        # Can't move past another figure or onto or past its own trajectory,
+        # can fly over other trajectories but cannot land on them
+        return geometry.slider_targets(sq, directions, figures | figure.trajectory_mask, trajectories)
+
+    # Get possible moves for a figure
+    def get_possible_moves(self, cell):
+        return self.geometry.to_coords(self.possible_moves_mask(cell, self.trajectory_mask()))
+
+    # Move the figure on start_cell to (x, y), returns the new trajectory segment
+    def make_move(self, start_cell, x, y):
+        target_cell = self.board[x][y]
+        figure = start_cell.figure
+        # Record trajectory
+        trajectory = self.get_trajectory(start_cell, target_cell)
+        segment = trajectory[1:]  # Exclude starting cell to avoid duplicates
+        # Update the figure's trajectory
+        previous_mask = figure.trajectory_mask
+        figure.trajectory.extend(segment)
+        for sx, sy in segment:
+            figure.trajectory_mask |= 1 << self.geometry.square(sx, sy)
+        # Move the figure to the new cell
+        target_cell.figure = figure
+        start_cell.figure = None
+        target_bit = 1 << self.geometry.square(x, y)
+        self.figure_mask ^= (1 << self.geometry.square(start_cell.x, start_cell.y)) | target_bit
+        # If captures a pawn, set figure to inactive
+        captured = target_cell.pawn
+        if captured:
+            target_cell.pawn = False
+            self.pawn_mask &= ~target_bit
+            figure.active = False
+        self.move_count += 1
+        self.history.append((start_cell, target_cell, len(segment), captured, previous_mask))
+        return segment
+
+    # Take back the last move, used by search
+    def undo_move(self):
+        start_cell, target_cell, segment_length, captured, previous_mask = self.history.pop()
+        figure = target_cell.figure
+        del figure.trajectory[len(figure.trajectory) - segment_length:]
+        figure.trajectory_mask = previous_mask
+        target_bit = 1 << self.geometry.square(target_cell.x, target_cell.y)
+        if captured:
+            target_cell.pawn = True
+            self.pawn_mask |= target_bit
+            figure.active = True
+        start_cell.figure = figure
+        target_cell.figure = None
+        self.figure_mask ^= (1 << self.geometry.square(start_cell.x, start_cell.y)) | target_bit
+        self.move_count -= 1
+
+    # Moves made so far as ((x0, y0), (x1, y1)) pairs
+    def move_list(self):
+        return [((start.x, start.y), (target.x, target.y)) for start, target, *_ in self.history]
+
+    # Cells holding an active figure
+    def active_cells(self):
+        coords = self.geometry.coords
+        cells = []
+        for sq in iter_squares(self.figure_mask):
+            x, y = coords[sq]
+            cell = self.board[x][y]
+            if cell.figure.active:
+                cells.append(cell)
+        return cells
+
+    # Get every legal move as (from cell, (x, y)) for all active figures
+    def all_possible_moves(self):
+        moves = []
+        trajectories = self.trajectory_mask()
+        to_coords = self.geometry.to_coords
+        for cell in self.active_cells():
+            moves.extend((cell, move) for move in to_coords(self.possible_moves_mask(cell, trajectories)))
+        return moves
+
+    # Check if all pawns are destroyed
+    def all_pawns_destroyed(self):
+        return not self.pawn_mask
+
+    # Check if any moves are possible
+    def any_possible_moves(self):
+        trajectories = self.trajectory_mask()
+        for cell in self.active_cells():
+            if self.possible_moves_mask(cell, trajectories):
+                return True
+        return False
+
+
+# Set-based move generation, written square by square as the rules read.
+# Game.get_possible_moves must return the same squares; this version is
+# slow and kept as the reference for checking the bitmask engine.
+def reference_possible_moves(game, cell):
+    moves = []
+    occupied_cells_figures, occupied_cells_pawns, trajectory_cells = game.get_occupied_cells(exclude_cell=cell)
+    width, height = game.width, game.height
+
+    # Other trajectories (excluding the current figure's own trajectory)
+    other_trajectories = trajectory_cells.copy()
+    if cell.figure.trajectory:
+        other_trajectories.difference_update(cell.figure.trajectory)
+
+    figure_type = cell.figure.type
+
+    # For different figure types
+    if figure_type == "knight":
+        knight_moves = [
+            (-2, -1), (-1, -2), (1, -2), (2, -1),
+            (2, 1), (1, 2), (-1, 2), (-2, 1)
+        ]
+        for dx, dy in knight_moves:
+            x, y = cell.x + dx, cell.y + dy
+            if 0 <= x < width and 0 <= y < height:
+                if ((x, y) not in occupied_cells_figures and
+                    (x, y) not in other_trajectories and
+                    (x, y) not in cell.figure.trajectory):  # Exclude own trajectory
+                    moves.append((x, y))
+    elif figure_type == "king":
+        for dx, dy in [(-1, -1), (1, -1), (-1, 1), (1, 1), (0, 1), (1, 0), (-1, 0), (0, -1)]:
+            x, y = cell.x + dx, cell.y + dy
+            if 0 <= x < width and 0 <= y < height:
+                if ((x, y) not in occupied_cells_figures and
+                    (x, y) not in other_trajectories and
+                    (x, y) not in cell.figure.trajectory):  # Exclude own trajectory
+                    moves.append((x, y))
+    elif figure_type in ["rook", "bishop", "queen"]:
+        directions = []
+        if figure_type == "rook":
+            directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        elif figure_type == "bishop":
+            directions = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+        elif figure_type == "queen":
+            directions = [(-1, -1), (1, -1), (-1, 1), (1, 1), (0, 1), (1, 0), (-1, 0), (0, -1)]
+        for dx, dy in directions:
+            for step in range(1, max(width, height)):
+                x = cell.x + dx * step
+                y = cell.y + dy * step
+                if 0 <= x < width and 0 <= y < height:
+                    if (x, y) in occupied_cells_figures:
+                        break  # Can't move past another figure
+                    if (x, y) in cell.figure.trajectory:
+                        break  # Can't land on or move past own trajectory
+                    # Can fly over other trajectories but cannot land on them
+                    if (x, y) in other_trajectories:
+                        continue
+                    moves.append((x, y))
+                else:
+                    break
+    return moves
@@ -0,0 +1,288 @@
+"""Depth-first search for puzzle solutions.
+
+A figure is taken out of play by its capture and there are as many figures
+as pawns, so a solution is a move sequence in which every figure ends on a
+different pawn. The search plays moves on the Game itself and takes them
+back with undo_move, so it allocates no board copies.
+
+Two things keep the tree small:
+
+* can_still_win() prunes positions where the active figures can no longer
+  be matched to distinct reachable pawns. Reachability is optimistic (other
+  figures are assumed to move out of the way and the figure's own future
+  trajectory is ignored), so the pruning never discards a winnable position.
+* ordering.MoveOrderer tries the least mobile figures first (king, then
+  knight, then the sliders, which can fly over trajectories), captures
+  before quiet moves and moves towards the pawns before moves away from
+  them. It puts moves that bury a pawn under a trajectory last and learns
+  killer and history scores from earlier nodes.
+
+optimal_solutions() looks for the shortest solutions by branch and bound.
+moves_lower_bound() gives the cheapest assignment of figures to pawns by
+the optimistic move distances; it is far below the true length on full
+boards, so on 8x8 the search usually stops at its node limit with the best
+solution found so far. A node stops trying moves (a cutoff) as soon as a
+solution through it reaches its lower bound and no more solutions of that
+length are being counted.
+"""
+from collections import namedtuple
+
+from .bitboard import SLIDER_DIRECTIONS as BITBOARD_DIRECTIONS, iter_squares
+from .ordering import MoveOrderer
+
+DEFAULT_MAX_NODES = 200000
+
+# solution is a list of ((x0, y0), (x1, y1)) moves or None; complete is False
+# when the node limit stopped the search before it could decide
+SearchResult = namedtuple("SearchResult", ["solution", "nodes", "complete"])
+# steps is the length of the shortest solution found (None if there is none),
+# solutions the number of distinct move sets found that solve in that many
+# steps and bound the moves_lower_bound() of the starting position: steps is
+# optimal when the search is complete or steps equals bound
+OptimalResult = namedtuple("OptimalResult", ["steps", "solutions", "bound", "nodes", "complete"])
+MAX_SOLUTIONS = 100
+
+
+class SearchLimitReached(Exception):
+    pass
+
+
+def pawn_distances(game, cell, trajectories):
+    """Fewest moves the figure on cell needs to capture each pawn it could reach.
+
+    Keys are square indices and trajectories is Game.trajectory_mask().
+    Reachability is optimistic (other figures are assumed to move out of the
+    way and the figure's own future trajectory is ignored), so a distance is
+    never more than the figure really needs and a pawn missing from the
+    result is out of its reach for good.
+    """
+    figure = cell.figure
+    geometry = game.geometry
+    own = figure.trajectory_mask
+    forbidden = trajectories | own
+    directions = BITBOARD_DIRECTIONS.get(figure.type)
+    step_masks = geometry.knight if figure.type == "knight" else geometry.king
+    seen = frontier = 1 << geometry.square(cell.x, cell.y)
+    pawns = {}
+    distance = 0
+    while frontier:
+        distance += 1
+        reached = 0
+        for sq in iter_squares(frontier):
+            if directions:
+                # Can fly over other trajectories but not over its own
+                reached |= geometry.slider_targets(sq, directions, own, forbidden)
+            else:
+                reached |= step_masks[sq] & ~forbidden
+        reached &= ~seen
+        seen |= reached
+        captures = reached & game.pawn_mask
+        for sq in iter_squares(captures):
+            pawns[sq] = distance
+        frontier = reached & ~captures  # A capture ends the figure's play
+    return pawns
+
+
+def min_cost_assignment(costs, columns):
+    """Cheapest total cost of giving every row a different column, or None if impossible.
+
+    costs[i] maps column numbers 0..columns-1 to the cost for row i; missing
+    entries are not allowed. Hungarian method with potentials,
+    O(rows^2 * columns).
+    """
+    rows = len(costs)
+    if rows > columns:
+        return None
+    infinity = float("inf")
+    u = [0] * (rows + 1)
+    v = [0] * (columns + 1)
+    owner = [0] * (columns + 1)  # owner[j]: row (1-based) given column j, 0 for none
+    way = [0] * (columns + 1)
+    for i in range(1, rows + 1):
+        owner[0] = i
+        j0 = 0
+        min_slack = [infinity] * (columns + 1)
+        used = [False] * (columns + 1)
+        while True:
+            used[j0] = True
+            row = costs[owner[j0] - 1]
+            u_row = u[owner[j0]]
+            delta = infinity
+            j1 = 0
+            for j in range(1, columns + 1):
+                if not used[j]:
+                    slack = row.get(j - 1, infinity) - u_row - v[j]
+                    if slack < min_slack[j]:
+                        min_slack[j] = slack
+                        way[j] = j0
+                    if min_slack[j] < delta:
+                        delta = min_slack[j]
+                        j1 = j
+            if delta == infinity:
+                return None
+            for j in range(columns + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    return -v[0]
+
+
+def moves_lower_bound(game):
+    """At least how many more moves a win needs, or None if it can no longer be won.
+
+    Every pawn needs a figure of its own, so the bound is the cheapest way
+    to give each pawn a different figure when a figure's cost for a pawn is
+    its pawn_distances() entry.
+    """
+    trajectories = game.trajectory_mask()
+    cells = game.active_cells()
+    costs = {sq: {} for sq in iter_squares(game.pawn_mask)}
+    for column, cell in enumerate(cells):
+        for sq, distance in pawn_distances(game, cell, trajectories).items():
+            costs[sq][column] = distance
+    return min_cost_assignment(list(costs.values()), len(cells))
+
+
+def can_still_win(game):
+    """False if the remaining pawns cannot each be given a different figure that reaches them."""
+    return moves_lower_bound(game) is not None
+
+
+def find_solution(game, max_nodes=DEFAULT_MAX_NODES, order_moves=None):
+    """Search from the current position; the game is left as it was found.
+
+    order_moves(game, moves) returns the moves in the order to try them, a
+    new MoveOrderer by default.
+    """
+    if order_moves is None:
+        order_moves = MoveOrderer()
+    start_depth = len(game.history)
+    nodes = 0
+    # A MoveOrderer learns from the outcome of each move; plain functions do not.
+    # The first solution ends the search, so its moves are not counted as cutoffs
+    solved = getattr(order_moves, "solved", None)
+    failed = getattr(order_moves, "failed", None)
+
+    def dfs():
+        nonlocal nodes
+        if game.all_pawns_destroyed():
+            return True
+        nodes += 1
+        if nodes > max_nodes:
+            raise SearchLimitReached
+        if not can_still_win(game):
+            return False
+        depth = len(game.history)
+        for move in order_moves(game, game.all_possible_moves()):
+            cell, (x, y) = move
+            game.make_move(cell, x, y)
+            if dfs():
+                if solved is not None:
+                    solved(depth, move)
+                return True
+            game.undo_move()
+            if failed is not None:
+                failed(depth, move)
+        return False
+
+    try:
+        found = dfs()
+    except SearchLimitReached:
+        found = None
+    solution = game.move_list()[start_depth:] if found else None
+    while len(game.history) > start_depth:
+        game.undo_move()
+    return SearchResult(solution, nodes, found is not None)
+
+
+def optimal_solutions(game, max_nodes=DEFAULT_MAX_NODES, max_solutions=MAX_SOLUTIONS, order_moves=None):
+    """Branch and bound search for the shortest solutions from the current position.
+
+    find_solution() gives the first upper bound; moves_lower_bound() prunes
+    every line that cannot beat it, and cuts off the rest of a node's moves
+    once a solution found below it leaves them nothing to beat. Solutions
+    that play the same moves in a different order count once, and counting
+    stops at max_solutions. When the node limit is reached the result is the
+    best found so far, with complete set to False. The game is left as it was
+    found.
+    """
+    if order_moves is None:
+        order_moves = MoveOrderer()
+    cutoff = getattr(order_moves, "cutoff", None)
+    exhausted = getattr(order_moves, "exhausted", None)
+    solved_move = getattr(order_moves, "solved", None)
+    failed = getattr(order_moves, "failed", None)
+    root_bound = moves_lower_bound(game)
+    first = find_solution(game, max_nodes, order_moves)
+    if first.solution is None:
+        return OptimalResult(None, 0, root_bound, first.nodes, first.complete)
+    start_depth = len(game.history)
+    best = len(first.solution)
+    found = {frozenset(first.solution)}
+    nodes = first.nodes
+
+    # Once enough solutions of the best length are known, only shorter ones matter
+    def limit():
+        return best if len(found) < max_solutions else best - 1
+
+    # Returns True if the subtree held a solution no longer than the best
+    def dfs(depth):
+        nonlocal best, found, nodes
+        if game.all_pawns_destroyed():
+            solution = frozenset(game.move_list()[start_depth:])
+            if depth < best:
+                best, found = depth, {solution}
+            elif len(found) < max_solutions:
+                found.add(solution)
+            return True
+        bound = moves_lower_bound(game)
+        if bound is None or depth + bound > limit():
+            return False
+        nodes += 1
+        if nodes > max_nodes:
+            raise SearchLimitReached
+        solved = False
+        for index, move in enumerate(order_moves(game, game.all_possible_moves())):
+            cell, (x, y) = move
+            game.make_move(cell, x, y)
+            try:
+                child_solved = dfs(depth + 1)
+            finally:
+                game.undo_move()
+            if child_solved:
+                solved = True
+                # Every solution through this node is at least depth + bound
+                # long, so the other moves can no longer beat the best
+                if depth + bound > limit():
+                    if cutoff is not None:
+                        cutoff(start_depth + depth, move, index)
+                    return True
+                if solved_move is not None:
+                    solved_move(start_depth + depth, move)
+            elif failed is not None:
+                failed(start_depth + depth, move)
+        if exhausted is not None:
+            exhausted(start_depth + depth)
+        return solved
+
+    try:
+        dfs(0)
+        complete = True
+    except SearchLimitReached:
+        complete = False
+    return OptimalResult(best, len(found), root_bound, nodes, complete)
+
+
+def hint(game, max_nodes=DEFAULT_MAX_NODES):
+    """First move of a solution from the current position, or None."""
+    result = find_solution(game, max_nodes)
+    return result.solution[0] if result.solution else None
@@ -0,0 +1,435 @@
+"""Headless asyncio game server with a small JSON-over-HTTP API.
+
+    python -m trajectory_chess.server --port 8765
+
+Every session is a Game held in memory. The endpoints mirror GameWidget:
+
+    POST   /sessions                              {"unlimited": false, "width": 8, "height": 8,
+                                                   "pawn_rows": 1, "configuration": "1234",
+                                                   "pawn_layout": null} -> new session, all keys optional
+    GET    /sessions/<id>                         current state
+    DELETE /sessions/<id>
+    POST   /sessions/<id>/new_configuration
+    POST   /sessions/<id>/unlimited_configuration
+    POST   /sessions/<id>/restart_game
+    POST   /sessions/<id>/make_move               {"from": [x, y], "to": [x, y]}
+    GET    /sessions/<id>/possible_moves?x=&y=    one figure, or every legal move without x/y
+    POST   /sessions/<id>/hint                    first move of a solution, or null
+
+configuration and pawn_layout are sent as decimal strings, in requests
+and in the state, because the indices of big boards go past the integers a
+JavaScript number holds exactly. A puzzle entry of a schedule
+(trajectory_chess.puzzles) can be posted as it is to start that puzzle.
+
+Hints run a solver search (trajectory_chess.search) in a process pool, so
+the event loop only ever does the cheap rule checks. A session allows one
+hint in flight at a time, and at most --max-pending-hints hints wait for
+the pool; more get 503. Sessions idle for longer than --idle-timeout are
+evicted. The estimated memory of all sessions together is kept under
+--max-memory: new sessions and moves that would go over it are refused.
+Unexpected errors are logged and answered with 500.
+
+Everything runs on localhost, which is how tests/test_server.py drives it.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from .rules import Game
+from .search import DEFAULT_MAX_NODES, find_solution
+
+MAX_BODY_BYTES = 4096
+MAX_SESSIONS = 10000
+MAX_MEMORY_BYTES = 256 * 1024 * 1024
+MAX_PENDING_HINTS = 64
+IDLE_TIMEOUT = 600.0
+HINT_MAX_NODES = DEFAULT_MAX_NODES
+
+logger = logging.getLogger(__name__)
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def game_state(game):
+    figures = []
+    pawns = []
+    for row in game.board:
+        for cell in row:
+            if cell.figure:
+                figures.append({"type": cell.figure.type, "x": cell.x, "y": cell.y,
+                                "active": cell.figure.active,
+                                "trajectory": [list(coord) for coord in cell.figure.trajectory]})
+            if cell.pawn:
+                pawns.append([cell.x, cell.y])
+    if not pawns:
+        status = "won"
+    elif not game.any_possible_moves():
+        status = "lost"
+    else:
+        status = "playing"
+    return {"width": game.width, "height": game.height, "pawn_rows": game.pawn_rows,
+            "configuration": str(game.configuration_index()),
+            "pawn_layout": None if game.pawn_layout is None else str(game.pawn_layout),
+            "move_count": game.move_count, "status": status, "pawns": pawns, "figures": figures}
+
+
+# Rough memory per part of a session, in bytes
+CELL_BYTES = 200
+FIGURE_BYTES = 300
+TRAJECTORY_POINT_BYTES = 80
+HISTORY_ENTRY_BYTES = 120
+
+
+def estimate_session_bytes(game):
+    """Rough memory held by a session: cells, figures, trajectories and move history."""
+    cells = sum(len(row) for row in game.board)
+    points = sum(len(figure.trajectory) for figure in game.figures)
+    return (cells * CELL_BYTES + len(game.figures) * FIGURE_BYTES + points * TRAJECTORY_POINT_BYTES
+            + len(game.history) * HISTORY_ENTRY_BYTES)
+
+
+def estimate_move_bytes(game, cell, x, y):
+    """How much estimate_session_bytes() grows when the figure on cell moves to (x, y)."""
+    points = len(game.get_trajectory(cell, game.board[x][y])) - 1
+    return points * TRAJECTORY_POINT_BYTES + HISTORY_ENTRY_BYTES
+
+
+def compute_hint(board, config_index, pawn_layout, moves, max_nodes):
+    """Runs in a worker process: rebuild the position from its moves and search it.
+
+    board is the (width, height, pawn_rows) of the session's game.
+    """
+    game = Game(None, *board)
+    game.load_configuration(config_index, pawn_layout)
+    for (x0, y0), (x1, y1) in moves:
+        game.make_move(game.board[x0][y0], x1, y1)
+    result = find_solution(game, max_nodes)
+    move = result.solution[0] if result.solution else None
+    return move, result.complete
+
+
+class Session:
+    def __init__(self, session_id, unlimited=False, width=8, height=8, pawn_rows=1,
+                 configuration=None, pawn_layout=None):
+        self.id = session_id
+        self.game = Game(None, width, height, pawn_rows)
+        if configuration is not None:
+            self.game.load_configuration(configuration, pawn_layout)
+        elif unlimited:
+            self.game.unlimited_configuration()
+        else:
+            self.game.new_configuration()
+        self.last_used = time.monotonic()
+        self.hint_pending = False
+        self.bytes = estimate_session_bytes(self.game)
+
+
+class GameServer:
+    def __init__(self, max_sessions=MAX_SESSIONS, max_memory_bytes=MAX_MEMORY_BYTES,
+                 idle_timeout=IDLE_TIMEOUT, hint_workers=None, hint_max_nodes=HINT_MAX_NODES,
+                 max_pending_hints=MAX_PENDING_HINTS):
+        self.sessions = {}
+        self.max_sessions = max_sessions
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_bytes = 0  # Sum of the sessions' estimated bytes
+        self.idle_timeout = idle_timeout
+        self.hint_max_nodes = hint_max_nodes
+        self.hint_workers = hint_workers
+        self.max_pending_hints = max_pending_hints
+        self.pending_hints = 0  # Hints submitted to the pool and not yet answered
+        self.pool = None
+        self.server = None
+        self.eviction_task = None
+
+    async def start(self, host="127.0.0.1", port=8765):
+        # Spawned rather than forked: a child forked while the loop's resolver
+        # threads hold a lock can deadlock before it runs a single hint
+        self.pool = ProcessPoolExecutor(self.hint_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        self.eviction_task = asyncio.ensure_future(self.evict_idle_sessions())
+        return self.server
+
+    async def close(self):
+        if self.eviction_task:
+            self.eviction_task.cancel()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def add_session(self, session):
+        self.sessions[session.id] = session
+        self.memory_bytes += session.bytes
+
+    def remove_session(self, session_id):
+        self.memory_bytes -= self.sessions.pop(session_id).bytes
+
+    # Re-estimate a session's memory after its game changed
+    def update_bytes(self, session):
+        estimate = estimate_session_bytes(session.game)
+        self.memory_bytes += estimate - session.bytes
+        session.bytes = estimate
+
+    # Drop sessions that have not been used for idle_timeout seconds
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        idle = [session_id for session_id, session in self.sessions.items()
+                if now - session.last_used > self.idle_timeout]
+        for session_id in idle:
+            self.remove_session(session_id)
+        return len(idle)
+
+    async def evict_idle_sessions(self):
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 1.0))
+            self.evict_idle()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST,
+                                       {"error": "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST,
+                                       {"error": "Invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                       {"error": "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Access-Control-Allow-Origin: *\r\n"
+                f"Access-Control-Allow-Methods: GET, POST, DELETE, OPTIONS\r\n"
+                f"Access-Control-Allow-Headers: Content-Type\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        try:
+            url = urlsplit(target)
+            parts = [part for part in url.path.split("/") if part]
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+            if method == "OPTIONS":
+                return HTTPStatus.NO_CONTENT, None
+            if parts == ["sessions"] and method == "POST":
+                return HTTPStatus.CREATED, self.create_session(data)
+            if len(parts) < 2 or parts[0] != "sessions":
+                raise RequestError(HTTPStatus.NOT_FOUND, "Unknown endpoint")
+            session = self.get_session(parts[1])
+            action = parts[2] if len(parts) == 3 else None
+            if len(parts) > 3:
+                raise RequestError(HTTPStatus.NOT_FOUND, "Unknown endpoint")
+            if action is None and method == "GET":
+                return HTTPStatus.OK, self.session_state(session)
+            if action is None and method == "DELETE":
+                self.remove_session(session.id)
+                return HTTPStatus.NO_CONTENT, None
+            if action == "possible_moves" and method == "GET":
+                return HTTPStatus.OK, self.possible_moves(session, parse_qs(url.query))
+            if action == "hint" and method == "POST":
+                return HTTPStatus.OK, await self.hint(session)
+            if action == "make_move" and method == "POST":
+                return HTTPStatus.OK, self.make_move(session, data)
+            if action in ("new_configuration", "unlimited_configuration", "restart_game") and method == "POST":
+                getattr(session.game, action)()
+                self.update_bytes(session)
+                return HTTPStatus.OK, self.session_state(session)
+            raise RequestError(HTTPStatus.NOT_FOUND, "Unknown endpoint")
+        except RequestError as e:
+            return e.status, {"error": str(e)}
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return HTTPStatus.BAD_REQUEST, {"error": "Invalid JSON"}
+        except Exception:
+            # e.g. BrokenProcessPool from a hint; the client still gets an answer
+            logger.exception("%s %s failed", method, target)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+
+    def create_session(self, data):
+        if len(self.sessions) >= self.max_sessions and not self.evict_idle():
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many sessions")
+        try:
+            board = [int(data.get(key, default)) for key, default in
+                     (("width", 8), ("height", 8), ("pawn_rows", 1))]
+        except (TypeError, ValueError):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "width, height and pawn_rows must be integers")
+        configuration = parse_index(data, "configuration")
+        pawn_layout = parse_index(data, "pawn_layout")
+        if pawn_layout is not None and configuration is None:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "pawn_layout needs a configuration")
+        session_id = secrets.token_hex(8)
+        try:
+            session = Session(session_id, bool(data.get("unlimited")), *board, configuration, pawn_layout)
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+        if self.memory_bytes + session.bytes > self.max_memory_bytes:
+            self.evict_idle()
+            if self.memory_bytes + session.bytes > self.max_memory_bytes:
+                raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Server memory limit reached")
+        self.add_session(session)
+        return self.session_state(session)
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, "Unknown session")
+        session.last_used = time.monotonic()
+        return session
+
+    def session_state(self, session):
+        state = game_state(session.game)
+        state["session"] = session.id
+        return state
+
+    def possible_moves(self, session, query):
+        game = session.game
+        if "x" in query or "y" in query:
+            x, y = parse_square([query.get("x", [""])[0], query.get("y", [""])[0]], game)
+            cell = game.board[x][y]
+            if not (cell.figure and cell.figure.active):
+                return {"moves": []}
+            return {"moves": [list(move) for move in game.get_possible_moves(cell)]}
+        return {"moves": [[[cell.x, cell.y], list(move)] for cell, move in game.all_possible_moves()]}
+
+    def make_move(self, session, data):
+        game = session.game
+        x0, y0 = parse_square(data.get("from"), game)
+        x1, y1 = parse_square(data.get("to"), game)
+        cell = game.board[x0][y0]
+        if not (cell.figure and cell.figure.active) or (x1, y1) not in game.get_possible_moves(cell):
+            raise RequestError(HTTPStatus.CONFLICT, "Illegal move")
+        growth = estimate_move_bytes(game, cell, x1, y1)
+        if self.memory_bytes + growth > self.max_memory_bytes:
+            self.evict_idle()
+            if self.memory_bytes + growth > self.max_memory_bytes:
+                raise RequestError(HTTPStatus.INSUFFICIENT_STORAGE, "Server memory limit reached")
+        game.make_move(cell, x1, y1)
+        self.update_bytes(session)
+        return self.session_state(session)
+
+    async def hint(self, session):
+        if session.hint_pending:
+            raise RequestError(HTTPStatus.TOO_MANY_REQUESTS, "A hint is already being computed")
+        if self.pending_hints >= self.max_pending_hints:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many hints queued")
+        game = session.game
+        # Snapshot the position; the search runs on a copy in a worker process
+        config_index, moves, move_count = game.configuration_index(), game.move_list(), game.move_count
+        board = (game.width, game.height, game.pawn_rows)
+        pawn_layout = game.pawn_layout
+        session.hint_pending = True
+        self.pending_hints += 1
+        try:
+            loop = asyncio.get_running_loop()
+            move, complete = await loop.run_in_executor(
+                self.pool, compute_hint, board, config_index, pawn_layout, moves, self.hint_max_nodes)
+        finally:
+            session.hint_pending = False
+            self.pending_hints -= 1
+        return {"move_count": move_count, "complete": complete,
+                "move": None if move is None else {"from": list(move[0]), "to": list(move[1])}}
+
+
+def parse_index(data, key):
+    """An optional configuration index or pawn layout: a decimal string, or a JSON integer."""
+    value = data.get(key)
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    raise RequestError(HTTPStatus.BAD_REQUEST, f"{key} must be a decimal string")
+
+
+def parse_square(value, game):
+    try:
+        x, y = (int(v) for v in value)
+    except (TypeError, ValueError):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Squares are [x, y] pairs")
+    if not (0 <= x < game.width and 0 <= y < game.height):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Square off the board")
+    return x, y
+
+
+async def serve(args):
+    server = GameServer(max_sessions=args.max_sessions, max_memory_bytes=args.max_memory,
+                        idle_timeout=args.idle_timeout, hint_workers=args.workers,
+                        max_pending_hints=args.max_pending_hints)
+    await server.start(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trajectory chess game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="hint worker processes")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    parser.add_argument("--max-memory", type=int, default=MAX_MEMORY_BYTES,
+                        help="estimated bytes all sessions together may use")
+    parser.add_argument("--max-pending-hints", type=int, default=MAX_PENDING_HINTS,
+                        help="hints waiting for or running in the pool at most")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Startup trace: when the app reached each milestone on its way to the first frame.
+
+main.py imports this module before Kivy and calls trace.mark() at each
+milestone:
+
+    imports       Kivy and the game modules are loaded
+    build         App.build() starts
+    widgets       the game widget tree exists
+    first_frame   the first frame has been presented; the board takes touches
+    ready         setup deferred past the first frame is done
+
+Times are seconds since this module was imported. Where /proc is available
+(Linux and Android) the report also gives how long the process had been
+running by then, which covers interpreter start-up and, on Android, the
+Python bootstrap. Cold start to first interactive frame is that offset plus
+the first_frame time.
+
+finish() logs a one-line summary and, when a path is given with
+``--startup-trace`` or the TRAJECTORY_CHESS_STARTUP_TRACE environment
+variable, writes the report as JSON. Marking is a list append, so the trace
+is always on.
+"""
+import json
+import logging
+import os
+import time
+
+ENV_VAR = "TRAJECTORY_CHESS_STARTUP_TRACE"
+
+logger = logging.getLogger(__name__)
+
+
+def process_age():
+    """Seconds since this process started, or None where /proc cannot tell."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the command name, which is in parentheses and may contain spaces
+            fields = f.read().rpartition(")")[2].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")  # starttime, field 22 of stat
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(uptime - started, 0.0)
+
+
+class StartupTrace:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.process_offset = process_age()  # Process age at origin, None if unknown
+        self.milestones = []  # (name, seconds since origin)
+        self.dump_path = None  # Set from --startup-trace
+        self.finished = False
+
+    def mark(self, name):
+        elapsed = time.perf_counter() - self.origin
+        self.milestones.append((name, elapsed))
+        logger.debug("Startup milestone %s at %.1f ms", name, elapsed * 1000)
+
+    def report(self):
+        return {
+            "process_offset_ms": None if self.process_offset is None else round(self.process_offset * 1000, 1),
+            "milestones": [{"name": name, "ms": round(elapsed * 1000, 1)} for name, elapsed in self.milestones],
+        }
+
+    def summary(self):
+        parts = [f"{name} {elapsed * 1000:.0f} ms" for name, elapsed in self.milestones]
+        if self.process_offset is not None:
+            parts.insert(0, f"process started {self.process_offset * 1000:.0f} ms earlier")
+        return ", ".join(parts)
+
+    def finish(self):
+        """Log the summary and write the report if a dump path was given; only once."""
+        if self.finished:
+            return
+        self.finished = True
+        # summary() walks every milestone, so only build it when it is logged
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Startup: %s", self.summary())
+        dump_path = self.dump_path or os.environ.get(ENV_VAR)
+        if dump_path:
+            with open(dump_path, "w") as f:
+                json.dump(self.report(), f, indent=2)
+
+
+# Started on import, so main.py imports this module first
+trace = StartupTrace()
+
+
+def add_startup_trace_argument(parser):
+    parser.add_argument("--startup-trace", metavar="JSON", default=None,
+                        help="write the startup milestone times to JSON")
@@ -0,0 +1,382 @@
+"""Player statistics: an append-only log of finished games and a streaming aggregator.
+
+A stats file starts with the magic bytes ``TCS1`` followed by one 20-byte
+record per game, little-endian:
+
+    u64  configuration ID (configuration_id())
+    u32  when the game ended, seconds since the epoch
+    u32  time played in milliseconds
+    u16  steps
+    u8   outcome: 0 won, 1 lost, 2 abandoned
+    u8   unused
+
+Fixed-size records let the aggregator unpack whole blocks at once with
+struct.iter_unpack and split a file between processes at any record
+boundary. A partial record at the end, left by an interrupted append, is
+logged and ignored by the readers and cut off by StatsRecorder before it
+appends:
+
+    python -m trajectory_chess.stats games.tcs --workers 8 --top 20
+    python -m trajectory_chess.stats games.tcs --schedule daily.json --json report.json
+
+For each configuration the report gives the games, the win rate and
+percentiles of the winning step counts and of the time played. Percentiles
+come from QuantileSketch, a log-bucketed sketch with a fixed relative
+error, so memory grows with the number of configurations and not with the
+number of games. Sketches from several processes merge exactly.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import struct
+import sys
+import time
+
+MAGIC = b"TCS1"
+RECORD = struct.Struct("<QIIHBx")
+BLOCK_RECORDS = 8192
+
+WON = 0
+LOST = 1
+ABANDONED = 2
+OUTCOMES = {WON: "won", LOST: "lost", ABANDONED: "abandoned"}
+
+RELATIVE_ACCURACY = 0.01
+MAX_BINS = 1024
+PERCENTILES = (50, 90, 99)
+HASHED_ID_BIT = 1 << 63
+
+logger = logging.getLogger(__name__)
+
+
+def configuration_id(game):
+    """A 64-bit ID for the game's starting position.
+
+    The configuration index on the standard board, which is below 5 ** 8.
+    Other board sizes and pawn layouts get a hash of their description with
+    the top bit set, so the two kinds of ID never collide.
+    """
+    if game.is_standard_board():
+        return game.configuration_index()
+    description = f"{game.width}x{game.height}x{game.pawn_rows}:{game.configuration_index()}:{game.pawn_layout}"
+    digest = hashlib.blake2b(description.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | HASHED_ID_BIT
+
+
+def append_stats(path, config_id, outcome, steps, seconds, ended=None):
+    with open(path, "ab") as f:
+        if f.tell() == 0:
+            f.write(MAGIC)
+        f.write(RECORD.pack(config_id, int(time.time() if ended is None else ended),
+                            min(int(seconds * 1000), 0xFFFFFFFF), min(steps, 0xFFFF), outcome))
+
+
+def record_count(path):
+    """Complete records in the file; a truncated last record is logged and not counted."""
+    size = os.path.getsize(path) - len(MAGIC)
+    if size % RECORD.size:
+        logger.warning("%s ends with a truncated record at byte %d; it is skipped",
+                       path, len(MAGIC) + size - size % RECORD.size)
+    return max(size, 0) // RECORD.size
+
+
+def truncate_partial_record(path):
+    """Cut off a truncated last record so appends start on a record boundary; returns the bytes removed."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r+b") as f:
+        head = f.read(len(MAGIC))
+        size = f.seek(0, os.SEEK_END)
+        if head == MAGIC:
+            end = size - (size - len(MAGIC)) % RECORD.size
+        elif MAGIC.startswith(head):
+            end = 0  # Cut off while the magic was written
+        else:
+            raise ValueError(f"{path} is not a stats file")
+        removed = size - end
+        if removed:
+            logger.warning("%s ends with a truncated record at byte %d; removing %d bytes", path, end, removed)
+            f.truncate(end)
+    return removed
+
+
+def iter_stats(path, first=0, count=None):
+    """Yield (config_id, ended, milliseconds, steps, outcome) for count records from record number first.
+
+    A truncated last record is skipped.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a stats file")
+        f.seek(len(MAGIC) + first * RECORD.size)
+        remaining = record_count(path) - first if count is None else count
+        while remaining > 0:
+            block = f.read(RECORD.size * min(remaining, BLOCK_RECORDS))
+            if len(block) % RECORD.size:
+                block = block[:len(block) - len(block) % RECORD.size]
+                remaining = len(block) // RECORD.size
+            if not block:
+                return
+            remaining -= len(block) // RECORD.size
+            yield from RECORD.iter_unpack(block)
+
+
+class QuantileSketch:
+    """Streaming quantiles of positive values, each within RELATIVE_ACCURACY of the true one.
+
+    Values are counted in buckets whose bounds grow geometrically, as in
+    DDSketch. When there are more than MAX_BINS buckets the lowest are
+    folded together, which only coarsens the smallest quantiles.
+    """
+    __slots__ = ["bins", "zeros", "count"]
+    # Shared by every sketch so that any two can be merged
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    multiplier = 1 / math.log(gamma)
+    max_bins = MAX_BINS
+
+    def __init__(self):
+        self.bins = {}  # Key: bucket index, Value: count
+        self.zeros = 0  # Values of 0 or less
+        self.count = 0
+
+    def add(self, value, count=1):
+        self.count += count
+        if value <= 0:
+            self.zeros += count
+            return
+        index = math.ceil(math.log(value) * self.multiplier)
+        bins = self.bins
+        bins[index] = bins.get(index, 0) + count
+        if len(bins) > self.max_bins:
+            self.collapse()
+
+    def collapse(self):
+        indices = sorted(self.bins)
+        excess = indices[:len(indices) - self.max_bins + 1]
+        folded = sum(self.bins.pop(index) for index in excess)
+        target = indices[len(excess)]
+        self.bins[target] += folded
+
+    def merge(self, other):
+        self.count += other.count
+        self.zeros += other.zeros
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self.collapse()
+
+    def quantile(self, q):
+        """The q-quantile (0 to 1), None if nothing was added."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+        seen = self.zeros
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # The middle of the bucket, in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class ConfigurationStats:
+    __slots__ = ["outcomes", "win_steps", "seconds"]
+
+    def __init__(self):
+        self.outcomes = [0, 0, 0]  # Games per outcome, indexed by WON, LOST, ABANDONED
+        self.win_steps = QuantileSketch()
+        self.seconds = QuantileSketch()
+
+    @property
+    def games(self):
+        return sum(self.outcomes)
+
+    def win_rate(self):
+        """Share of the finished (won or lost) games that were won."""
+        finished = self.outcomes[WON] + self.outcomes[LOST]
+        return self.outcomes[WON] / finished if finished else None
+
+    def merge(self, other):
+        self.outcomes = [a + b for a, b in zip(self.outcomes, other.outcomes)]
+        self.win_steps.merge(other.win_steps)
+        self.seconds.merge(other.seconds)
+
+    def summary(self):
+        return {
+            "games": self.games,
+            **{name: self.outcomes[outcome] for outcome, name in OUTCOMES.items()},
+            "win_rate": self.win_rate(),
+            "win_steps": {f"p{p}": self.win_steps.quantile(p / 100) for p in PERCENTILES},
+            "seconds": {f"p{p}": self.seconds.quantile(p / 100) for p in PERCENTILES},
+        }
+
+
+def aggregate_range(task):
+    """Stats per configuration ID, and for all games under None, over one range of records."""
+    path, first, count = task
+    by_config = {}
+    # QuantileSketch.add() inlined, with the bucket of each step count computed
+    # once, as this loop runs once per game
+    log = math.log
+    ceil = math.ceil
+    multiplier = QuantileSketch.multiplier
+    max_bins = QuantileSketch.max_bins
+    step_buckets = [None] + [ceil(log(steps) * multiplier) for steps in range(1, 0x10000)]
+    for config_id, _, milliseconds, steps, outcome in iter_stats(path, first, count):
+        stats = by_config.get(config_id)
+        if stats is None:
+            stats = by_config[config_id] = ConfigurationStats()
+        stats.outcomes[outcome] += 1
+        sketch = stats.seconds
+        sketch.count += 1
+        if milliseconds:
+            bins = sketch.bins
+            index = ceil(log(milliseconds / 1000) * multiplier)
+            bins[index] = bins.get(index, 0) + 1
+            if len(bins) > max_bins:
+                sketch.collapse()
+        else:
+            sketch.zeros += 1
+        if outcome == WON:
+            sketch = stats.win_steps
+            sketch.count += 1
+            if steps:
+                bins = sketch.bins
+                index = step_buckets[steps]
+                bins[index] = bins.get(index, 0) + 1
+                if len(bins) > max_bins:
+                    sketch.collapse()
+            else:
+                sketch.zeros += 1
+    total = ConfigurationStats()
+    for stats in by_config.values():
+        total.merge(stats)
+    by_config[None] = total
+    return by_config
+
+
+def aggregate(path, workers=1):
+    """Stats per configuration ID, plus None for all games, with the file split between workers."""
+    records = record_count(path)
+    share = -(-records // workers) if records else 0
+    tasks = [(path, first, min(share, records - first)) for first in range(0, records, share or 1)]
+    merged = {None: ConfigurationStats()}
+    if workers > 1 and len(tasks) > 1:
+        from multiprocessing import Pool  # Front-ends only append, so they never need a pool
+        with Pool(workers) as pool:
+            parts = pool.map(aggregate_range, tasks)
+    else:
+        parts = map(aggregate_range, tasks)
+    for part in parts:
+        for config_id, stats in part.items():
+            if config_id in merged:
+                merged[config_id].merge(stats)
+            else:
+                merged[config_id] = stats
+    return merged
+
+
+class StatsRecorder:
+    """Appends a stats record for each game a front-end plays.
+
+    start() is called for every new or restarted game and finish() when it
+    ends; the outcome and steps are read from the game. start() records an
+    abandoned game if at least one move was played. Time runs from start().
+    The first append removes a truncated record left at the end of the file
+    by an earlier run.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.game = None
+        self.config_id = None
+        self.started = None
+        self.start_moves = 0
+        self.checked = False
+
+    def start(self, game):
+        self.finish()
+        self.game = game
+        self.config_id = configuration_id(game)
+        self.started = time.monotonic()
+        self.start_moves = game.move_count
+
+    def finish(self):
+        game = self.game
+        if game is None or game.move_count <= self.start_moves:
+            self.game = None
+            return
+        if game.all_pawns_destroyed():
+            outcome = WON
+        elif not game.any_possible_moves():
+            outcome = LOST
+        else:
+            outcome = ABANDONED
+        if not self.checked:
+            truncate_partial_record(self.path)
+            self.checked = True
+        append_stats(self.path, self.config_id, outcome, game.move_count, time.monotonic() - self.started)
+        self.game = None
+
+
+def schedule_labels(path):
+    """Label each configuration ID of a puzzle schedule with its date and band."""
+    from .puzzles import DailySchedule, puzzle_game
+    schedule = DailySchedule(path)
+    labels = {}
+    for offset in range(len(schedule.puzzles)):
+        puzzle = schedule.puzzle_at(offset)
+        if puzzle is None:
+            continue
+        day = schedule.start + datetime.timedelta(days=offset)
+        labels[configuration_id(puzzle_game(puzzle))] = f"{day} {puzzle.get('band', '')}".strip()
+    return labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate player statistics")
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--top", type=int, default=20, help="configurations to print, most played first")
+    parser.add_argument("--min-games", type=int, default=1)
+    parser.add_argument("--schedule", help="puzzle schedule to label its configurations with dates and bands")
+    parser.add_argument("--json", metavar="PATH", help="write every configuration's summary here")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    merged = aggregate(args.path, args.workers)
+    elapsed = time.perf_counter() - start
+    total = merged.pop(None)
+    labels = schedule_labels(args.schedule) if args.schedule else {}
+    print(f"{total.games} games, {len(merged)} configurations in {elapsed:.2f}s "
+          f"({total.games / elapsed if elapsed else 0:.0f} games/s)")
+
+    def line(name, stats):
+        summary = stats.summary()
+        win_rate = "-" if summary["win_rate"] is None else f"{summary['win_rate']:.0%}"
+        steps = "/".join("-" if v is None else f"{v:.0f}" for v in summary["win_steps"].values())
+        seconds = "/".join("-" if v is None else f"{v:.0f}" for v in summary["seconds"].values())
+        return f"{name:24} {summary['games']:>8} {win_rate:>5} {steps:>12} {seconds:>14}"
+
+    percentiles = "/".join(f"p{p}" for p in PERCENTILES)
+    print(f"{'configuration':24} {'games':>8} {'wins':>5} {'steps ' + percentiles:>12} {'seconds ' + percentiles:>14}")
+    print(line("all", total))
+    played = sorted((item for item in merged.items() if item[1].games >= args.min_games),
+                    key=lambda item: item[1].games, reverse=True)
+    for config_id, stats in played[:args.top]:
+        print(line(labels.get(config_id, str(config_id)), stats))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"all": total.summary(),
+                       "configurations": {str(config_id): dict(stats.summary(), label=labels.get(config_id))
+                                          for config_id, stats in played}}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())